@@ -0,0 +1,56 @@
+# Memory and draw time of the giveaway entrant set at 10k, 100k and 1M entrants.
+# Run from the repo root: python benchmarks/bench_entrants.py
+# "set MB" counts only the set itself; its int objects (~32 bytes each) come on top.
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+SIZES = (10_000, 100_000, 1_000_000)
+WINNERS = 10
+DISCORD_EPOCH_MS = 1420070400000
+
+
+def snowflakes(n, rng):
+    # Realistic ids: a millisecond timestamp in the high bits, worker/sequence noise below.
+    base = (int(time.time() * 1000) - DISCORD_EPOCH_MS) << 22
+    return [base - (rng.randrange(1 << 37) << 22) - rng.randrange(1 << 22) for _ in range(n)]
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def run():
+    rng = random.Random(0)
+    print(f"{'entrants':>10} {'set MB':>8} {'compact MB':>11} {'build s':>8} {'lookup us':>10} {'draw us':>8}")
+    for n in SIZES:
+        ids = snowflakes(n, rng)
+        _, set_bytes, _ = measure(lambda: set(ids))
+        entrants, compact_bytes, build = measure(lambda: main.EntrantSet(ids))
+        probes = rng.sample(ids, 1000)
+        start = time.perf_counter()
+        assert all(user_id in entrants for user_id in probes)
+        lookup = (time.perf_counter() - start) / len(probes)
+        draw_rng = random.Random(1)
+        start = time.perf_counter()
+        for _ in range(100):
+            entrants.draw(WINNERS, draw_rng)
+        draw = (time.perf_counter() - start) / 100
+        print(f"{n:>10} {set_bytes / 1e6:>8.1f} {compact_bytes / 1e6:>11.1f} {build:>8.2f} "
+              f"{lookup * 1e6:>10.2f} {draw * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,187 @@
+# Wall time, allocations and Discord API calls for the arranger, the embed channel picker and
+# the giveaway buttons, run against synthetic guilds from fakediscord.py (no network needed).
+# Run from the repo root:
+#   python benchmarks/bench_offline.py --save before.json
+#   ... change the code ...
+#   python benchmarks/bench_offline.py --baseline before.json
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from fakediscord import FakeHTTP, FakeInteraction, make_guild, patched_http, reset_state
+
+GIVEAWAY_ID = 1
+
+
+async def arrange_all(guilds, channel_ids=None):
+    for guild in guilds:
+        await main.arrange_guild(guild, channel_ids and channel_ids[guild.id])
+
+
+# Each scenario is (setup, run): setup builds fresh state untimed, run is what gets measured.
+async def cold_sort_setup(http, opts):
+    return [make_guild(http, n + 1, opts.channels, opts.dates, arranged=False) for n in range(opts.guilds)]
+
+async def cold_sort(guilds):
+    await arrange_all(guilds)
+
+
+async def steady_setup(http, opts):
+    guilds = await cold_sort_setup(http, opts)
+    await arrange_all(guilds)
+    return guilds
+
+async def steady_state(guilds):
+    await arrange_all(guilds)
+
+
+async def new_order_setup(http, opts):
+    guilds = await steady_setup(http, opts)
+    added = {}
+    for guild in guilds:
+        channel = guild.text_channels[len(guild.text_channels) // 2]
+        added[guild.id] = [guild.add_text_channel(channel.name.split("-", 1)[0] + "-order-new").id]
+    return guilds, added
+
+async def new_order(state):
+    guilds, added = state
+    await arrange_all(guilds, added)
+
+
+async def overflow_setup(http, opts):
+    # A few busy dates, so every date needs several "(n)" overflow categories.
+    return [make_guild(http, n + 1, opts.channels * 9 // 10, 3, arranged=False) for n in range(opts.guilds)]
+
+
+async def picker_setup(http, opts):
+    return [make_guild(http, n + 1, opts.channels, opts.dates) for n in range(opts.guilds)]
+
+async def channel_picker(guilds):
+    # First open (cold cache), paging, then a search, per guild.
+    for guild in guilds:
+        for page in range(4):
+            main.get_channel_options(guild, page)
+        main.get_channel_options(guild, 0, "order-1")
+
+
+async def giveaway_setup(http, opts):
+    main.GIVEAWAYS.giveaways.clear()
+    main.GIVEAWAYS.entrants.clear()
+    main.GIVEAWAYS.pending.clear()
+    main.GIVEAWAYS.giveaways[GIVEAWAY_ID] = {"guild_id": 1, "channel_id": 1, "ends_at": 0, "config": {}}
+    main.GIVEAWAYS.entrants[GIVEAWAY_ID] = main.EntrantSet()
+    view = main.GiveawayEnterView()
+    users = range(10**17, 10**17 + opts.entrants)
+    clicks = [FakeInteraction(http, main.bot3, user_id, GIVEAWAY_ID) for user_id in users]
+    return view, clicks
+
+async def giveaway_clicks(state):
+    # Everyone enters, a tenth clicks again, a tenth leaves.
+    view, clicks = state
+    for interaction in clicks:
+        await view.enter_giveaway.callback(interaction)
+    for interaction in clicks[::10]:
+        await view.enter_giveaway.callback(interaction)
+        await view.leave_giveaway.callback(interaction)
+
+
+SCENARIOS = {
+    "cold sort": (cold_sort_setup, cold_sort),
+    "steady state": (steady_setup, steady_state),
+    "single new order": (new_order_setup, new_order),
+    "overflow sort": (overflow_setup, cold_sort),
+    "channel picker": (picker_setup, channel_picker),
+    "giveaway clicks": (giveaway_setup, giveaway_clicks),
+}
+
+
+async def measure(setup, run, opts):
+    # Best-of-N wall time from untraced runs with the GC paused (as timeit does), then one
+    # extra run under tracemalloc for the allocation peak.
+    times = []
+    for attempt in range(opts.repeat + 1):
+        http = FakeHTTP()
+        reset_state()
+        with patched_http(main.bot2, http):
+            state = await setup(http, opts)
+            http.calls.clear()
+            traced = attempt == opts.repeat
+            gc.collect()
+            if traced:
+                tracemalloc.start()
+            else:
+                gc.disable()
+            start = time.perf_counter()
+            try:
+                await run(state)
+            finally:
+                elapsed = time.perf_counter() - start
+                gc.enable()
+            if traced:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            else:
+                times.append(elapsed)
+    routes = {}
+    for call in http.calls:
+        routes[call[0]] = routes.get(call[0], 0) + 1
+    return {"ms": min(times) * 1000, "peak_kib": peak / 1024, "api_calls": len(http.calls), "routes": routes}
+
+
+def change(new, old):
+    if not old:
+        return ""
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+async def run(opts):
+    baseline = {}
+    if opts.baseline:
+        with open(opts.baseline) as f:
+            baseline = json.load(f)["results"]
+    print(f"{opts.guilds} guilds x {opts.channels} channels over {opts.dates} dates, "
+          f"{opts.entrants} giveaway entrants, best of {opts.repeat}")
+    print(f"{'scenario':<18} {'ms':>9} {'':>6} {'peak KiB':>9} {'':>6} {'API calls':>9}  routes")
+    results = {}
+    for name, (setup, scenario) in SCENARIOS.items():
+        if opts.only and name not in opts.only:
+            continue
+        result = results[name] = await measure(setup, scenario, opts)
+        old = baseline.get(name, {})
+        routes = ", ".join(f"{route}={count}" for route, count in sorted(result["routes"].items()))
+        calls = f"{result['api_calls']}"
+        if "api_calls" in old and old["api_calls"] != result["api_calls"]:
+            calls += f" (was {old['api_calls']})"
+        print(f"{name:<18} {result['ms']:9.2f} {change(result['ms'], old.get('ms')):>6} "
+              f"{result['peak_kib']:9.1f} {change(result['peak_kib'], old.get('peak_kib')):>6} "
+              f"{calls:>9}  {routes}")
+    if opts.save:
+        with open(opts.save, "w") as f:
+            json.dump({"options": vars(opts), "results": results}, f, indent=2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guilds", type=int, default=10)
+    # 400 channels + 50 categories stays under Discord's 500-channel guild limit.
+    parser.add_argument("--channels", type=int, default=400, help="order channels per guild")
+    parser.add_argument("--dates", type=int, default=50, help="distinct order dates per guild")
+    parser.add_argument("--entrants", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", action="append", choices=list(SCENARIOS))
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a file written by --save")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,64 @@
+# Per-pass cost of the order arranger at 500 channels / 50 categories.
+# Run from the repo root: python benchmarks/bench_orders.py
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import discord
+import main
+from fakediscord import FakeHTTP, make_guild
+
+CHANNELS = 500
+CATEGORIES = 50
+REPEAT = 200
+
+
+def legacy_pass(guild):
+    # The pre-index arranger loop, minus its API calls.
+    order_cats = [cat for cat in guild.categories if re.match(r"\d{1,2}[a-z]+ orders$", cat.name)]
+    for channel in guild.text_channels:
+        match = re.match(r"(\d{1,2})([a-zA-Z]+)", channel.name)
+        if not match:
+            continue
+        month_raw = match.group(2).lower()
+        for month in main.MONTHS:
+            if month_raw.startswith(month[:3]):
+                name = main.get_order_category_name(int(match.group(1)), month)
+                discord.utils.get(order_cats, name=name)
+                break
+
+
+def clear_caches():
+    main.parse_order_info_from_channel.cache_clear()
+    main.is_order_category_name.cache_clear()
+    main.order_name_sort_key.cache_clear()
+
+
+def report(label, fn):
+    best = min(timeit.repeat(fn, number=REPEAT, repeat=5)) / REPEAT
+    print(f"{label:<34} {best * 1e6:10.1f} us/pass")
+
+
+def run():
+    guild = make_guild(FakeHTTP(), 1, CHANNELS, CATEGORIES)
+    one = [guild.text_channels[CHANNELS // 2].id]
+    print(f"{CHANNELS} channels, {CATEGORIES} categories")
+    report("legacy scan", lambda: legacy_pass(guild))
+    report("index rebuild (cold caches)", lambda: (clear_caches(), main.OrderIndex().rebuild(guild)))
+    main.ORDER_INDEXES.pop(guild.id, None)
+    main.get_order_index(guild)
+    report("full plan (warm index)", lambda: main.plan_arrangement(*main.snapshot_layout(guild)))
+    report("incremental plan (1 channel)", lambda: main.plan_arrangement(*main.snapshot_layout(guild, one)))
+    index = main.get_order_index(guild)
+    day, month = index.channels[one[0]]
+    report("!orders lookup (1 date)", lambda: index.between((day, month), (day, month)))
+    report("!orders lookup (1 month)", lambda: index.between((1, month), (31, month)))
+    assert not main.plan_arrangement(*main.snapshot_layout(guild))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,195 @@
+# Offline stand-ins for the guild, channel and HTTP objects the bots touch, so the arranger,
+# channel picker and giveaway handlers can be measured without a live Discord.
+# Every write lands in FakeHTTP.calls instead of the network and is applied to the fake guild.
+import contextlib
+import random
+from types import SimpleNamespace
+
+import discord
+import main
+
+DAYS = range(1, 29)
+
+
+class FakeHTTP:
+    def __init__(self):
+        self.calls = []
+        self.guilds = {}
+
+    def record(self, route, *args):
+        self.calls.append((route,) + args)
+
+    async def bulk_channel_update(self, guild_id, data, reason=None):
+        self.record("bulk_channel_update", guild_id, len(data))
+        self.guilds[guild_id].apply_bulk(data)
+
+
+class FakeMember:
+    def __init__(self, id):
+        self.id = id
+
+
+class FakeChannel:
+    def __init__(self, guild, id, name, position, category=None):
+        self.guild = guild
+        self.id = id
+        self.name = name
+        self.position = position
+        self.category = category
+
+    @property
+    def category_id(self):
+        return self.category.id if self.category else None
+
+    def permissions_for(self, member):
+        return SimpleNamespace(send_messages=True, view_channel=True)
+
+    async def delete(self, reason=None):
+        self.guild.http.record("delete_channel", self.guild.id, self.id)
+        self.guild.remove(self)
+
+
+class FakeCategory(FakeChannel):
+    type = discord.ChannelType.category
+
+    @property
+    def channels(self):
+        # Like discord.py: a fresh scan of every guild channel, sorted, on each access.
+        children = [c for c in self.guild.channels if c.category_id == self.id]
+        children.sort(key=lambda c: (c.type != discord.ChannelType.text, c.position))
+        return children
+
+
+class FakeTextChannel(FakeChannel):
+    type = discord.ChannelType.text
+
+
+class FakeGuild:
+    def __init__(self, id, http):
+        self.id = id
+        self.name = f"guild-{id}"
+        self.http = http
+        self.me = FakeMember(id)
+        self._channels = {}
+        self._next_id = id * 1_000_000
+        http.guilds[id] = self
+
+    def new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    @property
+    def categories(self):
+        return sorted((c for c in self._channels.values() if c.type == discord.ChannelType.category),
+                      key=lambda c: (c.position, c.id))
+
+    @property
+    def text_channels(self):
+        return sorted((c for c in self._channels.values() if c.type == discord.ChannelType.text),
+                      key=lambda c: (c.position, c.id))
+
+    @property
+    def channels(self):
+        return discord.utils.SequenceProxy(self._channels.values())
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def add_category(self, name):
+        position = max((c.position for c in self.categories), default=-1) + 1
+        cat = FakeCategory(self, self.new_id(), name, position)
+        self._channels[cat.id] = cat
+        return cat
+
+    def add_text_channel(self, name, category=None):
+        channel = FakeTextChannel(self, self.new_id(), name, len(self._channels), category)
+        self._channels[channel.id] = channel
+        return channel
+
+    def notify(self, channel, removed=False):
+        # What bot2's channel create/update/delete events would do to the order index.
+        index = main.ORDER_INDEXES.get(self.id)
+        if index is not None:
+            (index.remove_channel if removed else index.update_channel)(channel)
+
+    async def create_category(self, name, reason=None):
+        self.http.record("create_channel", self.id, name)
+        cat = self.add_category(name)
+        self.notify(cat)
+        return cat
+
+    def remove(self, channel):
+        self._channels.pop(channel.id, None)
+        self.notify(channel, removed=True)
+        for child in getattr(channel, "channels", ()):
+            child.category = None
+
+    def apply_bulk(self, data):
+        for entry in data:
+            channel = self._channels[entry["id"]]
+            if "parent_id" in entry:
+                channel.category = self._channels.get(entry["parent_id"])
+            if "position" in entry:
+                channel.position = entry["position"]
+
+
+def order_dates(count, rng):
+    # Random order dates spread over the whole year, in calendar order.
+    dates = rng.sample([(day, month) for month in main.MONTHS for day in DAYS], count)
+    return sorted(dates, key=lambda d: (main.MONTHS.index(d[1]), d[0]))
+
+
+def make_guild(http, id, channels=500, dates=50, arranged=True, seed=0):
+    # An order server: `channels` order channels over `dates` order dates. Arranged guilds
+    # already have every category in calendar order; unarranged ones have no categories at all.
+    rng = random.Random(seed * 1009 + id)
+    guild = FakeGuild(id, http)
+    dates = order_dates(dates, rng)
+    categories = {}
+    if arranged:
+        for day, month in dates:
+            categories[(day, month)] = guild.add_category(main.get_order_category_name(day, month))
+    for n in range(channels):
+        day, month = dates[n % len(dates)] if arranged else rng.choice(dates)
+        guild.add_text_channel(f"{day}{month[:3]}-order-{n}", categories.get((day, month)))
+    return guild
+
+
+class FakeResponse:
+    def __init__(self, http):
+        self.http = http
+
+    async def send_message(self, content=None, **kwargs):
+        self.http.record("interaction_response", content)
+
+    async def edit_message(self, **kwargs):
+        self.http.record("interaction_response", None)
+
+
+class FakeInteraction:
+    def __init__(self, http, client, user_id, message_id=None):
+        self.client = client
+        self.user = FakeMember(user_id)
+        self.message = SimpleNamespace(id=message_id)
+        self.response = FakeResponse(http)
+
+
+@contextlib.contextmanager
+def patched_http(bot, http):
+    # Route a bot's raw HTTP calls (e.g. bot2.http.bulk_channel_update) to the recorder.
+    real = bot.http
+    bot.http = http
+    try:
+        yield http
+    finally:
+        bot.http = real
+
+
+def reset_state():
+    # Forget everything main.py cached about earlier fake guilds.
+    main.ORDER_INDEXES.clear()
+    main.ARRANGE_DIRTY.clear()
+    main.SENDABLE_CHANNELS.clear()
+    main.parse_order_info_from_channel.cache_clear()
+    main.is_order_category_name.cache_clear()
+    main.order_name_sort_key.cache_clear()
@@ -1,33 +1,438 @@
 import os
+import sys
+import signal
+import argparse
 import asyncio
 import random
+import secrets
 import re
+import functools
+import heapq
+import itertools
+import bisect
+import hashlib
+import json
+import gzip
+import sqlite3
+import time
+import math
+import logging
+import contextlib
+from array import array
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 import discord
+from aiohttp import web
 from discord.ext import commands, tasks
 from discord.ui import View, Modal, TextInput, button
 from dotenv import load_dotenv
 
 load_dotenv()
 
-intents = discord.Intents.default()
-intents.guilds = True
-intents.messages = True
-intents.message_content = True
-intents.reactions = True
-intents.members = True
+# None of the bots read cached messages back; views and edits work from ids and interaction payloads.
+MAX_CACHED_MESSAGES = int(os.getenv("MAX_CACHED_MESSAGES", "0")) or None
+
+def bot_intents(**extra):
+    # Prefix commands need guild messages and their content; each bot opts into anything more.
+    return discord.Intents(guilds=True, guild_messages=True, message_content=True, **extra)
+
+# ---------------- METRICS ---------------- #
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the /metrics endpoint
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+class Metrics:
+    # Small in-process Prometheus registry: counters, gauges and histograms keyed by
+    # sorted label tuples, plus collectors that refresh gauges right before a scrape.
+    def __init__(self):
+        self.meta = {}        # name -> (type, help, buckets)
+        self.values = {}      # name -> {labels: value}
+        self.collectors = []
+
+    def describe(self, name, kind, text, buckets=LATENCY_BUCKETS):
+        self.meta[name] = (kind, text, buckets)
+        self.values.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        series = self.values[name]
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        self.values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self.meta[name][2]
+        series = self.values[name]
+        key = tuple(sorted(labels.items()))
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = [0] * (len(buckets) + 2)  # bucket counts, sum, count
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                hist[i] += 1
+        hist[-2] += value
+        hist[-1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Failed to collect metrics: {e}")
+        lines = []
+        for name, (kind, text, buckets) in self.meta.items():
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in self.values[name].items():
+                if kind != "histogram":
+                    lines.append(f"{name}{format_labels(key)} {value}")
+                    continue
+                for bound, count in zip(buckets, value):
+                    lines.append(f"{name}_bucket{format_labels(key + (('le', bound),))} {count}")
+                lines.append(f"{name}_bucket{format_labels(key + (('le', '+Inf'),))} {value[-1]}")
+                lines.append(f"{name}_sum{format_labels(key)} {value[-2]}")
+                lines.append(f"{name}_count{format_labels(key)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(key):
+    if not key:
+        return ""
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in key) + "}"
+
+METRICS = Metrics()
+METRICS.describe("discord_gateway_latency_seconds", "gauge", "Heartbeat latency per bot and shard.")
+METRICS.describe("event_loop_lag_seconds", "histogram", "How late a 0.5s sleep wakes up on the event loop.")
+METRICS.describe("discord_rate_limited_total", "counter", "429 responses reported by discord.py.")
+METRICS.describe("discord_rate_limit_wait_seconds_total", "counter", "Retry-After time spent waiting on 429s.")
+METRICS.describe("mutation_retries_total", "counter", "Scheduled writes requeued after a 429.")
+METRICS.describe("mutations_in_flight", "gauge", "Scheduled writes currently being sent.")
+METRICS.describe("mutations_queued", "gauge", "Scheduled writes waiting for their bucket.")
+METRICS.describe("bot_startup_seconds", "gauge", "Time from starting a bot to its first on_ready.")
+METRICS.describe("process_resident_memory_bytes", "gauge", "Resident set size of this process.")
+METRICS.describe("discord_cached_members", "gauge", "Members held in the bot's guild caches.")
+METRICS.describe("command_seconds", "histogram", "Prefix command latency.")
+METRICS.describe("interaction_seconds", "histogram", "Component, modal and slash command handler latency.")
+METRICS.describe("arranger_pass_seconds", "histogram", "Wall time of one arranger pass over a guild.")
+METRICS.describe("orders_archived_total", "counter", "Old order channels saved to a transcript and deleted.")
+METRICS.describe("arranger_pass_api_calls", "histogram", "Discord API calls made by one arranger pass.", COUNT_BUCKETS)
+
+RATE_LIMIT_BASE_RE = re.compile(r"^https?://[^/]+/api(?:/v\d+)?")
+RATE_LIMIT_ID_RE = re.compile(r"/(?=[\w-]*\d)[\w-]{15,}")  # snowflakes and webhook/interaction tokens
+
+def rate_limit_route(url):
+    return RATE_LIMIT_ID_RE.sub("/{id}", RATE_LIMIT_BASE_RE.sub("", str(url).split("?", 1)[0]))
+
+class RateLimitFilter(logging.Filter):
+    # discord.py retries 429s internally and only logs them; count them on the way through
+    # without swallowing the record. Every 429 logs "We are being rate limited..."; a global one
+    # then logs "Global rate limit has been hit..." straight after, which only relabels it.
+    def __init__(self):
+        super().__init__()
+        self.last = None
+
+    def filter(self, record):
+        msg = str(record.msg)
+        if msg.startswith("We are being rate limited.") and len(record.args) >= 3:
+            method, url, retry_after = record.args[-3:]
+            self.last = {"method": method, "route": rate_limit_route(url)}
+            METRICS.inc("discord_rate_limited_total", **self.last, **{"global": "false"})
+            METRICS.inc("discord_rate_limit_wait_seconds_total", float(retry_after))
+        elif msg.startswith("Global rate limit has been hit.") and self.last is not None:
+            METRICS.inc("discord_rate_limited_total", -1, **self.last, **{"global": "false"})
+            METRICS.inc("discord_rate_limited_total", **self.last, **{"global": "true"})
+            self.last = None
+        return True
+
+logging.getLogger("discord.http").addFilter(RateLimitFilter())
+
+RUNNING_BOTS = ()
+METRICS_TASKS = set()
+
+def bot_label(client):
+    for name in RUNNING_BOTS or BOTS:
+        if BOTS[name][0] is client:
+            return name
+    return "unknown"
+
+def collect_gateway_latency():
+    for name in RUNNING_BOTS:
+        client = BOTS[name][0]
+        latencies = client.latencies if isinstance(client, discord.AutoShardedClient) else [(0, client.latency)]
+        for shard_id, latency in latencies:
+            if math.isfinite(latency):
+                METRICS.set("discord_gateway_latency_seconds", latency, bot=name, shard=shard_id)
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS.
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def collect_process():
+    METRICS.set("process_resident_memory_bytes", rss_bytes())
+    for name in RUNNING_BOTS:
+        client = BOTS[name][0]
+        METRICS.set("discord_cached_members", sum(len(guild.members) for guild in client.guilds), bot=name)
+
+STARTED_AT = {}
+STARTUP_SECONDS = {}
+
+def report_startup(client):
+    # First on_ready only; reconnects fire it again.
+    name = bot_label(client)
+    if name in STARTUP_SECONDS or name not in STARTED_AT:
+        return
+    seconds = STARTUP_SECONDS[name] = time.perf_counter() - STARTED_AT[name]
+    METRICS.set("bot_startup_seconds", seconds, bot=name)
+    members = sum(len(guild.members) for guild in client.guilds)
+    print(f"{name} bot ready in {seconds:.1f}s: {len(client.guilds)} guilds, {members} cached members, "
+          f"process RSS {rss_bytes() / 2**20:.0f} MB")
+
+def collect_mutations():
+    METRICS.set("mutations_in_flight", MUTATIONS.in_flight)
+    METRICS.set("mutations_queued", sum(len(queue) for queue in MUTATIONS.queues.values()))
+
+METRICS.collectors += [collect_gateway_latency, collect_mutations, collect_process]
+
+def timed_interaction(func):
+    @functools.wraps(func)
+    async def wrapper(self, interaction, *args):
+        start = time.perf_counter()
+        try:
+            return await func(self, interaction, *args)
+        finally:
+            METRICS.observe("interaction_seconds", time.perf_counter() - start,
+                            bot=bot_label(interaction.client), handler=func.__qualname__)
+    return wrapper
+
+async def time_command(ctx):
+    ctx.metrics_started = time.perf_counter()
+
+async def record_command(ctx):
+    started = getattr(ctx, "metrics_started", None)
+    if started is not None:
+        METRICS.observe("command_seconds", time.perf_counter() - started,
+                        bot=bot_label(ctx.bot), command=ctx.command.qualified_name)
+
+async def monitor_event_loop(interval=0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        METRICS.observe("event_loop_lag_seconds", max(0.0, loop.time() - start - interval))
+
+async def start_metrics_server(port):
+    async def handle(request):
+        return web.Response(text=METRICS.render(), content_type="text/plain", charset="utf-8")
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, port).start()
+    print(f"Serving metrics on http://{METRICS_HOST}:{port}/metrics")
+    return runner
+
+# ---------------- DISCORD WRITE SCHEDULER ---------------- #
+MUTATION_MAX_IN_FLIGHT = int(os.getenv("MUTATION_MAX_IN_FLIGHT", "8"))
+MUTATION_RETRIES = 3
+# Passed to every bot as max_ratelimit_timeout: discord.py sleeps through shorter 429 waits
+# itself, but raises RateLimited for longer ones so the scheduler can park just that bucket.
+# discord.py raises anything below 30 up to 30 seconds.
+MAX_RATELIMIT_TIMEOUT = max(30.0, float(os.getenv("MAX_RATELIMIT_TIMEOUT", "30")))
+
+class Mutation:
+    __slots__ = ("guild_id", "route", "factory", "key", "future", "attempts")
+
+    def __init__(self, guild_id, route, factory, key, future):
+        self.guild_id = guild_id
+        self.route = route
+        self.factory = factory
+        self.key = key
+        self.future = future
+        self.attempts = 0
+
+class MutationScheduler:
+    # Every Discord write is queued here. Guild queues are served round-robin, each
+    # (route, guild) bucket has at most one request in flight, the total is capped, and a
+    # pending write is replaced by a newer one with the same key instead of being sent twice.
+    # Routes Discord limits per channel carry the channel or message id, e.g.
+    # ("edit_channel", channel id), so a parked bucket never holds up other channels.
+    def __init__(self, max_in_flight=MUTATION_MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self.queues = {}      # guild id -> deque of pending mutations
+        self.ring = deque()   # guild ids with pending mutations, in serving order
+        self.pending = {}     # coalesce key -> pending mutation
+        self.busy = set()     # (route, guild id) buckets with a request in flight
+        self.in_flight = 0
+        self.wake = asyncio.Event()
+        self.worker = None
+        self.tasks = set()
+
+    def submit(self, guild_id, route, factory, key=None):
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.get_running_loop().create_task(self.run())
+        job = self.pending.get(key) if key is not None else None
+        if job is not None:
+            job.factory = factory
+            return job.future
+        job = Mutation(guild_id, route, factory, key, asyncio.get_running_loop().create_future())
+        if key is not None:
+            self.pending[key] = job
+        self._enqueue(job)
+        return job.future
+
+    def _enqueue(self, job, front=False):
+        queue = self.queues.get(job.guild_id)
+        if queue is None:
+            queue = self.queues[job.guild_id] = deque()
+            self.ring.append(job.guild_id)
+        if front:
+            queue.appendleft(job)
+        else:
+            queue.append(job)
+        self.wake.set()
+
+    def _next(self):
+        for _ in range(len(self.ring)):
+            guild_id = self.ring[0]
+            self.ring.rotate(-1)
+            queue = self.queues[guild_id]
+            for job in queue:
+                if (job.route, guild_id) not in self.busy:
+                    queue.remove(job)
+                    if not queue:
+                        del self.queues[guild_id]
+                        self.ring.remove(guild_id)
+                    if job.key is not None:
+                        self.pending.pop(job.key, None)
+                    return job
+        return None
+
+    async def run(self):
+        while True:
+            job = self._next() if self.in_flight < self.max_in_flight else None
+            if job is None:
+                self.wake.clear()
+                await self.wake.wait()
+                continue
+            self.in_flight += 1
+            self.busy.add((job.route, job.guild_id))
+            task = asyncio.create_task(self._execute(job))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _execute(self, job):
+        retry_after = error = result = None
+        try:
+            result = await job.factory()
+        except discord.RateLimited as e:
+            retry_after = e.retry_after
+        except discord.HTTPException as e:
+            # Last resort: discord.py only lets a 429 through once its own retries are used up.
+            if e.status == 429:
+                retry_after = float(getattr(e.response, "headers", {}).get("Retry-After", 1))
+            error = e
+        except Exception as e:
+            error = e
+        self.in_flight -= 1
+        if retry_after is not None and job.attempts < MUTATION_RETRIES:
+            # The in-flight slot is already released: park only this bucket while every other
+            # route and guild keeps flowing.
+            job.attempts += 1
+            METRICS.inc("mutation_retries_total", route=job.route if isinstance(job.route, str) else job.route[0])
+            self.wake.set()
+            await asyncio.sleep(retry_after)
+            if job.key is not None:
+                self.pending.setdefault(job.key, job)
+            self._enqueue(job, front=True)
+        elif not job.future.done():
+            if error is not None:
+                job.future.set_exception(error)
+            elif retry_after is not None:
+                job.future.set_exception(RuntimeError(f"{job.route} is still rate limited"))
+            else:
+                job.future.set_result(result)
+        self.busy.discard((job.route, job.guild_id))
+        self.wake.set()
+
+MUTATIONS = MutationScheduler()
+
+def mutate(guild_id, route, factory, key=None):
+    return MUTATIONS.submit(guild_id, route, factory, key)
+
+# ---------------- LOCAL STORAGE ---------------- #
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+class LocalStore:
+    # One SQLite file in WAL mode, only ever touched from its own worker thread.
+    SCHEMA = ""
+
+    def __init__(self, filename):
+        self.path = os.path.join(DATA_DIR, filename)
+        self.db = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=filename)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+
+    async def call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def connect(self):
+        await self.call(self._connect)
 
 # ---------------- EMBED BUILDER BOT ---------------- #
-bot1 = commands.Bot(command_prefix="!", intents=intents)
+# Members stays on so on_member_update sees bot1's own role changes, but only bot1's own member
+# is cached and nothing is chunked; other members are fetched on demand.
+bot1 = commands.Bot(command_prefix="!", intents=bot_intents(members=True),
+                    member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False,
+                    max_messages=MAX_CACHED_MESSAGES, max_ratelimit_timeout=MAX_RATELIMIT_TIMEOUT)
+
+# Short keys and omitted defaults keep a stored draft to a few dozen bytes.
+DRAFT_FIELDS = (
+    ("t", "title", ""),
+    ("d", "description", ""),
+    ("i", "image_url", ""),
+    ("c", "color", 0x00ff00),
+    ("ch", "channel_ids", []),
+    ("th", "thumbnail_url", ""),
+)
 
 class EmbedBuilderState:
+    __slots__ = ("user_id", "title", "description", "image_url", "color", "channel_ids", "thumbnail_url")
     def __init__(self, user_id):
         self.user_id = user_id
         self.title = ""
         self.description = ""
         self.image_url = ""
         self.color = 0x00ff00
-        self.channel_id = None
+        self.channel_ids = []
         self.thumbnail_url = ""
     def build_embed(self):
         embed = discord.Embed(
@@ -40,71 +445,352 @@ class EmbedBuilderState:
         if self.thumbnail_url:
             embed.set_thumbnail(url=self.thumbnail_url)
         return embed
+    def dumps(self):
+        return json.dumps({key: getattr(self, attr) for key, attr, default in DRAFT_FIELDS
+                           if getattr(self, attr) != default}, separators=(",", ":"))
+    @classmethod
+    def loads(cls, user_id, data):
+        state = cls(user_id)
+        fields = json.loads(data)
+        for key, attr, _ in DRAFT_FIELDS:
+            if key in fields:
+                setattr(state, attr, fields[key])
+        if isinstance(state.channel_ids, int):
+            state.channel_ids = [state.channel_ids]
+        return state
 
-user_states = {}
-def get_channel_options(guild):
-    options = []
-    for channel in guild.text_channels:
-        if channel.permissions_for(guild.me).send_messages:
-            options.append(discord.SelectOption(label=channel.name, value=str(channel.id)))
-        if len(options) == 25:
-            break
+DRAFT_CACHE_SIZE = int(os.getenv("DRAFT_CACHE_SIZE", "500"))
+DRAFT_TTL = float(os.getenv("DRAFT_TTL_MINUTES", "60")) * 60
+DRAFT_RETENTION_DAYS = float(os.getenv("DRAFT_RETENTION_DAYS", "30"))
+
+class EmbedStore(LocalStore):
+    # Drafts are written through to disk on every save, so the in-memory LRU can drop them freely.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS drafts (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS templates (
+            guild_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (guild_id, name)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, filename="embeds.db"):
+        super().__init__(filename)
+        self.drafts = OrderedDict()  # user id -> (state, last used), least recently used first
+
+    def _prune(self, cutoff):
+        with self.db:
+            self.db.execute("DELETE FROM drafts WHERE updated_at < ?", (cutoff,))
+
+    async def open(self):
+        await self.connect()
+        await self.call(self._prune, time.time() - DRAFT_RETENTION_DAYS * 86400)
+
+    def _remember(self, state):
+        now = time.monotonic()
+        self.drafts[state.user_id] = (state, now)
+        self.drafts.move_to_end(state.user_id)
+        while self.drafts:
+            _, used = next(iter(self.drafts.values()))
+            if len(self.drafts) <= DRAFT_CACHE_SIZE and now - used <= DRAFT_TTL:
+                break
+            self.drafts.popitem(last=False)
+
+    def _fetch_draft(self, user_id):
+        row = self.db.execute("SELECT data FROM drafts WHERE user_id = ?", (user_id,)).fetchone()
+        return row and row[0]
+
+    async def get_draft(self, user_id):
+        entry = self.drafts.get(user_id)
+        if entry is not None:
+            state = entry[0]
+        else:
+            data = await self.call(self._fetch_draft, user_id)
+            if data is None:
+                return None
+            state = EmbedBuilderState.loads(user_id, data)
+        self._remember(state)
+        return state
+
+    def _write_draft(self, user_id, data):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO drafts VALUES (?, ?, ?)", (user_id, data, time.time()))
+
+    async def save_draft(self, state):
+        self._remember(state)
+        await self.call(self._write_draft, state.user_id, state.dumps())
+
+    def _write_template(self, guild_id, name, data):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO templates VALUES (?, ?, ?)", (guild_id, name, data))
+
+    async def save_template(self, guild_id, name, state):
+        await self.call(self._write_template, guild_id, name, state.dumps())
+
+    def _fetch_template(self, guild_id, name):
+        row = self.db.execute("SELECT data FROM templates WHERE guild_id = ? AND name = ?",
+                              (guild_id, name)).fetchone()
+        return row and row[0]
+
+    async def load_template(self, guild_id, name):
+        return await self.call(self._fetch_template, guild_id, name)
+
+    def _list_templates(self, guild_id):
+        rows = self.db.execute("SELECT name FROM templates WHERE guild_id = ? ORDER BY name", (guild_id,))
+        return [name for name, in rows]
+
+    async def list_templates(self, guild_id):
+        return await self.call(self._list_templates, guild_id)
+
+    def _delete_template(self, guild_id, name):
+        with self.db:
+            return self.db.execute("DELETE FROM templates WHERE guild_id = ? AND name = ?",
+                                   (guild_id, name)).rowcount
+
+    async def delete_template(self, guild_id, name):
+        return await self.call(self._delete_template, guild_id, name) > 0
+
+EMBEDS = EmbedStore()
+
+@bot1.event
+async def setup_hook():
+    await EMBEDS.open()
+
+PREVIEW_DEBOUNCE = float(os.getenv("PREVIEW_DEBOUNCE", "0.75"))
+
+CHANNEL_PAGE_SIZE = 25
+SEARCH_PREFIX_MAX = 32
+
+class SendableChannels:
+    # Text channels bot1 can post in for one guild. Channel events patch single entries, role
+    # changes drop the whole entry; the prefix index behind search() is rebuilt lazily after a change.
+    def __init__(self, guild):
+        me = guild.me
+        self.names = {channel.id: channel.name for channel in guild.text_channels
+                      if channel.permissions_for(me).send_messages}
+        self._ids = None
+        self._prefixes = None
+
+    def update(self, channel):
+        if channel.permissions_for(channel.guild.me).send_messages:
+            self.names[channel.id] = channel.name
+        else:
+            self.names.pop(channel.id, None)
+        self._ids = self._prefixes = None
+
+    def remove(self, channel_id):
+        if self.names.pop(channel_id, None) is not None:
+            self._ids = self._prefixes = None
+
+    def ids(self):
+        if self._ids is None:
+            self._ids = list(self.names)
+        return self._ids
+
+    def search(self, query):
+        # Matches a prefix of the name or of any "-"/"_"-separated word in it.
+        query = query.strip().lower()
+        if self._prefixes is None:
+            self._prefixes = {}
+            for channel_id, name in self.names.items():
+                name = name.lower()
+                keys = set()
+                for start in [0] + [i + 1 for i, c in enumerate(name) if c in "-_"]:
+                    word = name[start:start + SEARCH_PREFIX_MAX]
+                    keys.update(word[:n] for n in range(1, len(word) + 1))
+                for key in keys:
+                    self._prefixes.setdefault(key, []).append(channel_id)
+        matches = self._prefixes.get(query[:SEARCH_PREFIX_MAX], [])
+        if len(query) > SEARCH_PREFIX_MAX:
+            matches = [channel_id for channel_id in matches if query in self.names[channel_id].lower()]
+        return matches
+
+SENDABLE_CHANNELS = {}
+
+def get_sendable_channels(guild):
+    cache = SENDABLE_CHANNELS.get(guild.id)
+    if cache is None:
+        cache = SENDABLE_CHANNELS[guild.id] = SendableChannels(guild)
+    return cache
+
+def channel_matches(guild, query=""):
+    cache = get_sendable_channels(guild)
+    return cache.search(query) if query else cache.ids()
+
+def get_channel_options(guild, page=0, query="", selected=()):
+    cache = get_sendable_channels(guild)
+    start = page * CHANNEL_PAGE_SIZE
+    options = [discord.SelectOption(label=cache.names[channel_id], value=str(channel_id),
+                                    default=channel_id in selected)
+               for channel_id in channel_matches(guild, query)[start:start + CHANNEL_PAGE_SIZE]]
     if not options:
         options.append(discord.SelectOption(label="No channels available", value="0"))
     return options
 
+@bot1.event
+async def on_guild_channel_create(channel):
+    if channel.guild.id in SENDABLE_CHANNELS and isinstance(channel, discord.TextChannel):
+        SENDABLE_CHANNELS[channel.guild.id].update(channel)
+
+@bot1.event
+async def on_guild_channel_update(before, after):
+    if after.guild.id not in SENDABLE_CHANNELS:
+        return
+    if isinstance(after, discord.CategoryChannel) and before.overwrites != after.overwrites:
+        SENDABLE_CHANNELS.pop(after.guild.id, None)
+    elif isinstance(after, discord.TextChannel):
+        SENDABLE_CHANNELS[after.guild.id].update(after)
+
+@bot1.event
+async def on_guild_channel_delete(channel):
+    if channel.guild.id in SENDABLE_CHANNELS:
+        SENDABLE_CHANNELS[channel.guild.id].remove(channel.id)
+
+@bot1.event
+async def on_guild_role_create(role):
+    SENDABLE_CHANNELS.pop(role.guild.id, None)
+
+@bot1.event
+async def on_guild_role_update(before, after):
+    SENDABLE_CHANNELS.pop(after.guild.id, None)
+
+@bot1.event
+async def on_guild_role_delete(role):
+    SENDABLE_CHANNELS.pop(role.guild.id, None)
+
+@bot1.event
+async def on_member_update(before, after):
+    if after.id == bot1.user.id and before.roles != after.roles:
+        SENDABLE_CHANNELS.pop(after.guild.id, None)
+
+@bot1.event
+async def on_guild_remove(guild):
+    SENDABLE_CHANNELS.pop(guild.id, None)
+
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "5"))
+BROADCAST_RETRIES = 3
+
+async def broadcast_embed(embed, channels, report):
+    # One embed object for every target. Short 429 waits are slept through by discord.py and
+    # long ones (over MAX_RATELIMIT_TIMEOUT) are parked and retried by the mutation scheduler;
+    # other server errors get a short backoff here. Returns {channel: error} for the failures.
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    failures = {}
+    done = 0
+    async def send_one(channel):
+        nonlocal done
+        async with semaphore:
+            for attempt in range(BROADCAST_RETRIES):
+                try:
+                    # Message sends are rate limited per channel, so each channel is its own bucket.
+                    await mutate(channel.guild.id, ("send_message", channel.id), lambda: channel.send(embed=embed))
+                    break
+                except discord.HTTPException as e:
+                    if e.status < 500 or attempt == BROADCAST_RETRIES - 1:
+                        failures[channel] = e.text or str(e.status)
+                        break
+                    await asyncio.sleep(2 ** attempt)
+                except Exception as e:
+                    failures[channel] = str(e)
+                    break
+        done += 1
+        await report(done, failures)
+    await asyncio.gather(*(send_one(channel) for channel in channels))
+    return failures
+
+class AddChannelsModal(discord.ui.Modal, title="Add Channels by ID"):
+    channel_ids = discord.ui.TextInput(label="Channel IDs or #mentions, any server",
+                                       style=discord.TextStyle.paragraph, max_length=2000)
+    def __init__(self, builder):
+        super().__init__()
+        self.builder = builder
+    @timed_interaction
+    async def on_submit(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        added, rejected = [], []
+        allowed = {}  # guild id -> whether the user may post there
+        for channel_id in dict.fromkeys(int(i) for i in re.findall(r"\d{15,20}", self.channel_ids.value)):
+            channel = bot1.get_channel(channel_id)
+            if not isinstance(channel, discord.TextChannel) or not channel.permissions_for(channel.guild.me).send_messages:
+                rejected.append(str(channel_id))
+                continue
+            if channel.guild.id not in allowed:
+                try:
+                    member = await channel.guild.fetch_member(interaction.user.id)
+                except discord.HTTPException:
+                    member = None
+                allowed[channel.guild.id] = member
+            member = allowed[channel.guild.id]
+            if member is None or not channel.permissions_for(member).send_messages:
+                rejected.append(channel.mention)
+                continue
+            if channel_id not in self.builder.state.channel_ids:
+                self.builder.state.channel_ids.append(channel_id)
+            added.append(channel.mention)
+        self.builder.request_preview()
+        lines = [f"Added {len(added)} channel(s); {len(self.builder.state.channel_ids)} selected in total."]
+        if rejected:
+            lines.append("Can't send there (unknown channel or missing permission): " + ", ".join(rejected))
+        await interaction.followup.send("\n".join(lines)[:2000], ephemeral=True)
+
+class ChannelSearchModal(discord.ui.Modal, title="Search Channels"):
+    query = discord.ui.TextInput(label="Channel name (leave empty to list all)", required=False, max_length=100)
+    def __init__(self, builder):
+        super().__init__()
+        self.builder = builder
+    @timed_interaction
+    async def on_submit(self, interaction: discord.Interaction):
+        self.builder.query = self.query.value.strip()
+        await self.builder.show_page(interaction, 0)
+
 class SetTitleModal(discord.ui.Modal, title="Set Embed Title"):
     new_title = discord.ui.TextInput(label="Title", max_length=256)
-    def __init__(self, state, preview_message, channel_options):
+    def __init__(self, builder):
         super().__init__()
-        self.state = state
-        self.preview_message = preview_message
-        self.channel_options = channel_options
+        self.builder = builder
+        self.state = builder.state
+    @timed_interaction
     async def on_submit(self, interaction: discord.Interaction):
         self.state.title = self.new_title.value
-        await self.preview_message.edit(
-            embed=self.state.build_embed(),
-            view=EmbedBuilderView(self.state, self.preview_message, self.channel_options)
-        )
         await interaction.response.send_message("Title updated!", ephemeral=True)
+        self.builder.request_preview()
 
 class SetDescriptionModal(discord.ui.Modal, title="Set Embed Description"):
     new_desc = discord.ui.TextInput(label="Description", style=discord.TextStyle.paragraph, max_length=2048)
-    def __init__(self, state, preview_message, channel_options):
+    def __init__(self, builder):
         super().__init__()
-        self.state = state
-        self.preview_message = preview_message
-        self.channel_options = channel_options
+        self.builder = builder
+        self.state = builder.state
+    @timed_interaction
     async def on_submit(self, interaction: discord.Interaction):
         self.state.description = self.new_desc.value
-        await self.preview_message.edit(
-            embed=self.state.build_embed(),
-            view=EmbedBuilderView(self.state, self.preview_message, self.channel_options)
-        )
         await interaction.response.send_message("Description updated!", ephemeral=True)
+        self.builder.request_preview()
 
 class SetImageModal(discord.ui.Modal, title="Set Image URL"):
     image_url = discord.ui.TextInput(label="Direct Image URL", placeholder="https://...", max_length=1024)
-    def __init__(self, state, preview_message, channel_options):
+    def __init__(self, builder):
         super().__init__()
-        self.state = state
-        self.preview_message = preview_message
-        self.channel_options = channel_options
+        self.builder = builder
+        self.state = builder.state
+    @timed_interaction
     async def on_submit(self, interaction: discord.Interaction):
         self.state.image_url = self.image_url.value
-        await self.preview_message.edit(
-            embed=self.state.build_embed(),
-            view=EmbedBuilderView(self.state, self.preview_message, self.channel_options)
-        )
         await interaction.response.send_message("Image updated!", ephemeral=True)
+        self.builder.request_preview()
 
 class SetColorModal(discord.ui.Modal, title="Set Embed Color"):
     color_hex = discord.ui.TextInput(label="Hex Color (e.g., 0xff5733 or #ff5733)", max_length=10)
-    def __init__(self, state, preview_message, channel_options):
+    def __init__(self, builder):
         super().__init__()
-        self.state = state
-        self.preview_message = preview_message
-        self.channel_options = channel_options
+        self.builder = builder
+        self.state = builder.state
+    @timed_interaction
     async def on_submit(self, interaction: discord.Interaction):
         color_str = self.color_hex.value.strip().replace("#", "0x")
         try:
@@ -112,183 +798,1137 @@ class SetColorModal(discord.ui.Modal, title="Set Embed Color"):
             self.state.color = color_val
         except Exception:
             self.state.color = 0x00ff00
-        await self.preview_message.edit(
-            embed=self.state.build_embed(),
-            view=EmbedBuilderView(self.state, self.preview_message, self.channel_options)
-        )
         await interaction.response.send_message("Color updated!", ephemeral=True)
+        self.builder.request_preview()
 
 class SetThumbnailModal(discord.ui.Modal, title="Set Thumbnail (Logo) URL"):
     thumbnail_url = discord.ui.TextInput(label="Direct Thumbnail/Logo URL", placeholder="https://...", max_length=1024)
-    def __init__(self, state, preview_message, channel_options):
+    def __init__(self, builder):
         super().__init__()
-        self.state = state
-        self.preview_message = preview_message
-        self.channel_options = channel_options
+        self.builder = builder
+        self.state = builder.state
+    @timed_interaction
     async def on_submit(self, interaction: discord.Interaction):
         self.state.thumbnail_url = self.thumbnail_url.value
-        await self.preview_message.edit(
-            embed=self.state.build_embed(),
-            view=EmbedBuilderView(self.state, self.preview_message, self.channel_options)
-        )
         await interaction.response.send_message("Thumbnail updated!", ephemeral=True)
+        self.builder.request_preview()
 
 class EmbedBuilderView(discord.ui.View):
     def __init__(self, state, preview_message, channel_options):
         super().__init__(timeout=None)
         self.state = state
         self.preview_message = preview_message
-        self.channel_options = channel_options
-        self.select_channel.options = channel_options
+        self.set_channel_options(channel_options)
+        self.page = 0
+        self.query = ""
+        self.rendered = None  # embed dict currently shown on the preview message
+        self.preview_dirty = False
+        self.preview_task = None
+    def request_preview(self):
+        # Modal submits only mark the draft dirty; one task coalesces them into a single edit.
+        self.preview_dirty = True
+        if self.preview_task is None or self.preview_task.done():
+            self.preview_task = asyncio.create_task(self.flush_preview())
+    async def flush_preview(self):
+        # Each flush also writes the draft through to the store.
+        while self.preview_dirty:
+            await asyncio.sleep(PREVIEW_DEBOUNCE)
+            self.preview_dirty = False
+            await EMBEDS.save_draft(self.state)
+            embed = self.state.build_embed()
+            rendered = embed.to_dict()
+            if rendered == self.rendered or not self.preview_message:
+                continue
+            self.rendered = rendered
+            await mutate(self.preview_message.guild.id, ("edit_message", self.preview_message.id),
+                         lambda: self.preview_message.edit(embed=embed),
+                         key=("edit_message", self.preview_message.id))
     @discord.ui.button(label="Set Title", style=discord.ButtonStyle.primary)
+    @timed_interaction
     async def set_title(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.state.user_id:
             return await interaction.response.send_message("You can't edit this embed!", ephemeral=True)
-        await interaction.response.send_modal(SetTitleModal(self.state, self.preview_message, self.channel_options))
+        await interaction.response.send_modal(SetTitleModal(self))
     @discord.ui.button(label="Set Description", style=discord.ButtonStyle.primary)
+    @timed_interaction
     async def set_description(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.state.user_id:
             return await interaction.response.send_message("You can't edit this embed!", ephemeral=True)
-        await interaction.response.send_modal(SetDescriptionModal(self.state, self.preview_message, self.channel_options))
+        await interaction.response.send_modal(SetDescriptionModal(self))
     @discord.ui.button(label="Set Image URL", style=discord.ButtonStyle.secondary)
+    @timed_interaction
     async def set_image(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.state.user_id:
             return await interaction.response.send_message("You can't edit this embed!", ephemeral=True)
-        await interaction.response.send_modal(SetImageModal(self.state, self.preview_message, self.channel_options))
+        await interaction.response.send_modal(SetImageModal(self))
     @discord.ui.button(label="Set Color", style=discord.ButtonStyle.secondary)
+    @timed_interaction
     async def set_color(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.state.user_id:
             return await interaction.response.send_message("You can't edit this embed!", ephemeral=True)
-        await interaction.response.send_modal(SetColorModal(self.state, self.preview_message, self.channel_options))
+        await interaction.response.send_modal(SetColorModal(self))
     @discord.ui.button(label="Set Thumbnail (Logo)", style=discord.ButtonStyle.secondary)
+    @timed_interaction
     async def set_thumbnail(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.state.user_id:
             return await interaction.response.send_message("You can't edit this embed!", ephemeral=True)
-        await interaction.response.send_modal(SetThumbnailModal(self.state, self.preview_message, self.channel_options))
+        await interaction.response.send_modal(SetThumbnailModal(self))
+    def set_channel_options(self, channel_options):
+        self.channel_options = channel_options
+        self.select_channel.options = channel_options
+        self.select_channel.max_values = len(channel_options)
     @discord.ui.select(
-        placeholder="Select Channel to Send Embed...",
-        min_values=1,
+        placeholder="Select Channels to Send Embed...",
+        min_values=0,
         max_values=1,
-        options=[]
+        options=[],
+        row=1
     )
+    @timed_interaction
     async def select_channel(self, interaction: discord.Interaction, select: discord.ui.Select):
         if interaction.user.id != self.state.user_id:
             return await interaction.response.send_message("You can't edit this embed!", ephemeral=True)
-        self.state.channel_id = int(select.values[0])
-        await interaction.response.send_message(f"Embed will be sent to <#{self.state.channel_id}>", ephemeral=True)
-    @discord.ui.button(label="Send Embed!", style=discord.ButtonStyle.success)
+        # The select only covers the current page; selections on other pages and added by ID stay.
+        page_ids = {int(option.value) for option in select.options}
+        chosen = [int(value) for value in select.values if value != "0"]
+        self.state.channel_ids = [c for c in self.state.channel_ids if c not in page_ids] + chosen
+        targets = self.state.channel_ids
+        if len(targets) <= 5:
+            text = ", ".join(f"<#{channel_id}>" for channel_id in targets) or "no channels"
+        else:
+            text = f"{len(targets)} channels"
+        await interaction.response.send_message(f"Embed will be sent to {text}", ephemeral=True)
+        self.request_preview()
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary, row=2)
+    @timed_interaction
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page - 1)
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary, row=2)
+    @timed_interaction
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)
+    @discord.ui.button(label="Search Channels", style=discord.ButtonStyle.secondary, row=2)
+    @timed_interaction
+    async def search_channels(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(ChannelSearchModal(self))
+    async def show_page(self, interaction, page):
+        pages = max(1, -(-len(channel_matches(interaction.guild, self.query)) // CHANNEL_PAGE_SIZE))
+        self.page = page % pages
+        self.set_channel_options(get_channel_options(interaction.guild, self.page, self.query, self.state.channel_ids))
+        label = f"matching '{self.query}', " if self.query else ""
+        self.select_channel.placeholder = f"Select Channels to Send Embed... ({label}page {self.page + 1}/{pages})"
+        await interaction.response.edit_message(view=self)
+    @discord.ui.button(label="Send Embed!", style=discord.ButtonStyle.success, row=3)
+    @timed_interaction
     async def send_embed(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.state.user_id:
             return await interaction.response.send_message("You can't send this embed!", ephemeral=True)
-        if not self.state.channel_id:
+        if not self.state.channel_ids:
             return await interaction.response.send_message("Please select a channel!", ephemeral=True)
-        channel = interaction.guild.get_channel(self.state.channel_id)
-        if not channel:
-            return await interaction.response.send_message("Selected channel not found.", ephemeral=True)
-        await channel.send(embed=self.state.build_embed())
-        await interaction.response.send_message(f"Embed sent to {channel.mention}!", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        embed = self.state.build_embed()
+        channels = [bot1.get_channel(channel_id) for channel_id in self.state.channel_ids]
+        missing = channels.count(None)
+        channels = [channel for channel in channels if channel]
+        if not channels:
+            return await interaction.followup.send("Selected channel not found.", ephemeral=True)
+        total = len(channels)
+        progress = await interaction.followup.send(f"Sending to {total} channel(s)...", ephemeral=True, wait=True)
+        async def report(done, failures):
+            content = f"Sending... {done}/{total} done, {len(failures)} failed"
+            await mutate(interaction.guild.id, ("edit_message", progress.id), lambda: progress.edit(content=content),
+                         key=("edit_message", progress.id))
+        failures = await broadcast_embed(embed, channels, report)
+        if total == 1 and not failures and not missing:
+            summary = f"Embed sent to {channels[0].mention}!"
+        else:
+            summary = f"Embed sent to {total - len(failures)}/{total + missing} channel(s)."
+            if missing:
+                summary += f"\n{missing} selected channel(s) no longer exist."
+            summary += "".join(f"\nFailed {channel.mention}: {error}" for channel, error in failures.items())
+        await mutate(interaction.guild.id, ("edit_message", progress.id), lambda: progress.edit(content=summary[:2000]),
+                     key=("edit_message", progress.id))
+    @discord.ui.button(label="Add Channels by ID", style=discord.ButtonStyle.secondary, row=3)
+    @timed_interaction
+    async def add_channels(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(AddChannelsModal(self))
+    @discord.ui.button(label="Clear Channels", style=discord.ButtonStyle.secondary, row=3)
+    @timed_interaction
+    async def clear_channels(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.state.channel_ids = []
+        self.request_preview()
+        await self.show_page(interaction, self.page)
     async def on_timeout(self):
         for item in self.children:
             item.disabled = True
         if self.preview_message:
-            await self.preview_message.edit(view=self)
+            await mutate(self.preview_message.guild.id, ("edit_message", self.preview_message.id),
+                         lambda: self.preview_message.edit(view=self),
+                         key=("edit_message", self.preview_message.id))
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         return interaction.user.id == self.state.user_id
 
-@bot1.command()
-async def embedbuilder(ctx):
-    state = EmbedBuilderState(ctx.author.id)
-    user_states[ctx.author.id] = state
-    channel_options = get_channel_options(ctx.guild)
+async def open_builder(ctx, state):
+    channel_options = get_channel_options(ctx.guild, selected=state.channel_ids)
     embed = state.build_embed()
     view = EmbedBuilderView(state, None, channel_options)
-    view.select_channel.options = channel_options
     msg = await ctx.send(embed=embed, view=view)
     view.preview_message = msg
+    view.rendered = embed.to_dict()
+
+@bot1.command()
+async def embedbuilder(ctx, *, template=None):
+    if template:
+        data = await EMBEDS.load_template(ctx.guild.id, template.strip().lower())
+        if data is None:
+            await ctx.send(f"No template named '{template}'. Use !templates to list them.")
+            return
+        state = EmbedBuilderState.loads(ctx.author.id, data)
+    else:
+        state = EmbedBuilderState(ctx.author.id)
+    await EMBEDS.save_draft(state)
+    await open_builder(ctx, state)
+
+@bot1.command()
+async def resumeembed(ctx):
+    state = await EMBEDS.get_draft(ctx.author.id)
+    if state is None:
+        await ctx.send("You have no saved draft. Start one with !embedbuilder.")
+        return
+    await open_builder(ctx, state)
+
+@bot1.command()
+@commands.has_permissions(manage_messages=True)
+async def savetemplate(ctx, *, name):
+    state = await EMBEDS.get_draft(ctx.author.id)
+    if state is None:
+        await ctx.send("You have no draft to save. Build one with !embedbuilder first.")
+        return
+    name = name.strip().lower()[:100]
+    await EMBEDS.save_template(ctx.guild.id, name, state)
+    await ctx.send(f"Saved your current draft as template '{name}'. Load it with !embedbuilder {name}")
+
+@bot1.command()
+async def templates(ctx):
+    names = await EMBEDS.list_templates(ctx.guild.id)
+    if not names:
+        await ctx.send("No templates saved yet. Use !savetemplate <name>.")
+        return
+    await ctx.send("Templates: " + ", ".join(names)[:1900])
+
+@bot1.command()
+@commands.has_permissions(manage_messages=True)
+async def deletetemplate(ctx, *, name):
+    if await EMBEDS.delete_template(ctx.guild.id, name.strip().lower()):
+        await ctx.send(f"Deleted template '{name}'.")
+    else:
+        await ctx.send(f"No template named '{name}'.")
 
 # ---------------- ORDER MANAGER BOT ---------------- #
-bot2 = commands.Bot(command_prefix="!", intents=intents)
+ORDER_SHARD_COUNT = int(os.getenv("ORDER_SHARD_COUNT", "0"))
+if ORDER_SHARD_COUNT:
+    # ORDER_SHARD_IDS picks this process's shards; the supervisor spreads them over processes.
+    shard_ids = [int(i) for i in os.getenv("ORDER_SHARD_IDS", "").split(",") if i.strip()] or None
+    bot2 = commands.AutoShardedBot(command_prefix="!", intents=bot_intents(),
+                                   member_cache_flags=discord.MemberCacheFlags.none(),
+                                   max_messages=MAX_CACHED_MESSAGES, max_ratelimit_timeout=MAX_RATELIMIT_TIMEOUT,
+                                   shard_count=ORDER_SHARD_COUNT, shard_ids=shard_ids)
+else:
+    bot2 = commands.Bot(command_prefix="!", intents=bot_intents(),
+                        member_cache_flags=discord.MemberCacheFlags.none(), max_messages=MAX_CACHED_MESSAGES,
+                        max_ratelimit_timeout=MAX_RATELIMIT_TIMEOUT)
 
 MONTHS = [
     'january', 'february', 'march', 'april', 'may', 'june',
     'july', 'august', 'september', 'october', 'november', 'december'
 ]
 
-def get_order_category_name(day, month):
-    return f"{day}{month.lower()} orders"
+# Discord caps a category at 50 channels and a guild at 500 channels (categories included).
+CATEGORY_CHANNEL_LIMIT = 50
+GUILD_CHANNEL_LIMIT = 500
+
+def get_order_category_name(day, month, part=1):
+    # Busy dates spill into "12march orders (2)", "(3)", ... once a category is full.
+    name = f"{day}{month.lower()} orders"
+    return name if part == 1 else f"{name} ({part})"
 
+ORDER_NAME_RE = re.compile(r"(\d{1,2})([a-zA-Z]+)")
+ORDER_CATEGORY_RE = re.compile(r"(\d{1,2})([a-z]+) orders(?: \((\d+)\))?$")
+MONTH_BY_PREFIX = {month[:3]: month for month in MONTHS}
+MONTH_INDEX = {month: idx for idx, month in enumerate(MONTHS)}
+ORDER_CHANNEL_TYPES = (discord.ChannelType.text, discord.ChannelType.news)
+
+@functools.lru_cache(maxsize=8192)
 def parse_order_info_from_channel(name):
-    match = re.match(r"(\d{1,2})([a-zA-Z]+)", name)
+    match = ORDER_NAME_RE.match(name)
     if match:
-        day = int(match.group(1))
-        month_raw = match.group(2).lower()
-        for month in MONTHS:
-            if month_raw.startswith(month[:3]):
-                return day, month
+        month = MONTH_BY_PREFIX.get(match.group(2)[:3].lower())
+        if month:
+            return int(match.group(1)), month
     return None, None
 
 def is_order_category(cat):
-    return re.match(r"\d{1,2}[a-z]+ orders$", cat.name)
+    return is_order_category_name(cat.name)
+
+@functools.lru_cache(maxsize=2048)
+def is_order_category_name(name):
+    return ORDER_CATEGORY_RE.match(name) is not None
 
 def category_sort_key(cat):
-    match = re.match(r"(\d{1,2})([a-z]+) orders$", cat.name)
+    return order_name_sort_key(cat.name)
+
+@functools.lru_cache(maxsize=2048)
+def order_name_sort_key(name):
+    match = ORDER_CATEGORY_RE.match(name)
     if match:
         day = int(match.group(1))
         month_raw = match.group(2)
         for idx, month in enumerate(MONTHS):
             if month_raw == month[:len(month_raw)]:
-                return (idx, day)
-    return (99, 99)
+                return (idx, day, int(match.group(3) or 1))
+    return (99, 99, 0)
+
+@functools.lru_cache(maxsize=2048)
+def parse_order_category_name(name):
+    # (day, month, part) for a category named exactly as get_order_category_name() would.
+    match = ORDER_CATEGORY_RE.match(name)
+    if match and match.group(2) in MONTH_INDEX:
+        day, month, part = int(match.group(1)), match.group(2), int(match.group(3) or 1)
+        if name == get_order_category_name(day, month, part):
+            return day, month, part
+    return None
+
+def date_key(day, month):
+    return (MONTH_INDEX[month], day)
+
+class OrderIndex:
+    # Kept current from channel events so a pass never has to rescan every text channel.
+    def __init__(self):
+        self.channels = {}    # order channel id -> (day, month)
+        self.categories = {}  # (day, month) -> ids of its "{day}{month} orders" categories, by part
+        self.dates = []       # sorted (month index, day, channel id), for date range queries
+        self.restored = False # loaded from the snapshot and not yet reconciled with the guild
+        self.changed = False  # touched since the last snapshot
+
+    def rebuild(self, guild):
+        self.channels.clear()
+        for channel in guild.text_channels:
+            day, month = parse_order_info_from_channel(channel.name)
+            if day and month and channel.type in ORDER_CHANNEL_TYPES:
+                self.channels[channel.id] = (day, month)
+        self.dates = sorted(date_key(*date) + (channel_id,) for channel_id, date in self.channels.items())
+        self.refresh_categories(guild)
+        self.restored = False
+        self.changed = True
+
+    def reconcile(self, guild):
+        # Warm start: the snapshot is trusted for channels it already knows; only channels
+        # created or deleted while the bot was offline are looked at. The next sweep rebuilds.
+        for channel_id in [channel_id for channel_id in self.channels if guild.get_channel(channel_id) is None]:
+            self._set(channel_id, None)
+        for channel in guild.text_channels:
+            if channel.id not in self.channels:
+                self.update_channel(channel)
+        self.refresh_categories(guild)
+        self.restored = False
+
+    def refresh_categories(self, guild):
+        parts = {}
+        for cat in guild.categories:
+            info = parse_order_category_name(cat.name)
+            if info:
+                parts.setdefault(info[:2], []).append((info[2], cat.id))
+        self.categories = {date: [cat_id for _, cat_id in sorted(ids)] for date, ids in parts.items()}
+
+    def update_channel(self, channel):
+        if channel.type == discord.ChannelType.category:
+            self.refresh_categories(channel.guild)
+        elif channel.type in ORDER_CHANNEL_TYPES:
+            day, month = parse_order_info_from_channel(channel.name)
+            self._set(channel.id, (day, month) if day and month else None)
+
+    def remove_channel(self, channel):
+        self._set(channel.id, None)
+        if channel.type == discord.ChannelType.category:
+            self.refresh_categories(channel.guild)
+
+    def _set(self, channel_id, date):
+        old = self.channels.get(channel_id)
+        if old == date:
+            return
+        if old:
+            del self.dates[bisect.bisect_left(self.dates, date_key(*old) + (channel_id,))]
+        if date:
+            self.channels[channel_id] = date
+            bisect.insort(self.dates, date_key(*date) + (channel_id,))
+        else:
+            del self.channels[channel_id]
+        self.changed = True
+
+    def between(self, start, end):
+        # Channel ids dated start..end inclusive, both (day, month); wraps past December.
+        lo, hi = date_key(*start), date_key(*end)
+        if lo > hi:
+            return self.between(start, (31, "december")) + self.between((1, "january"), end)
+        first = bisect.bisect_left(self.dates, lo)
+        last = bisect.bisect_left(self.dates, (hi[0], hi[1] + 1))
+        return [channel_id for _, _, channel_id in self.dates[first:last]]
+
+    def to_json(self):
+        return [[channel_id, day, month] for channel_id, (day, month) in self.channels.items()]
+
+    @classmethod
+    def from_json(cls, data):
+        index = cls()
+        index.channels = {channel_id: (day, month) for channel_id, day, month in data if month in MONTH_INDEX}
+        index.dates = sorted(date_key(*date) + (channel_id,) for channel_id, date in index.channels.items())
+        index.restored = True
+        return index
+
+ORDER_INDEXES = {}
+
+def get_order_index(guild):
+    index = ORDER_INDEXES.get(guild.id)
+    if index is None:
+        index = ORDER_INDEXES[guild.id] = OrderIndex()
+        index.rebuild(guild)
+    elif index.restored:
+        # A snapshot carries no categories; never plan or answer from it before reconciling.
+        index.reconcile(guild)
+    return index
+
+# One file per process, since each order manager process only sees its own shards' guilds.
+ORDER_INDEX_PATH = os.path.join(DATA_DIR, "order_index{}.json".format(
+    "-" + "_".join(str(i) for i in bot2.shard_ids) if getattr(bot2, "shard_ids", None) else ""))
+
+def _write_order_indexes(snapshot):
+    os.makedirs(os.path.dirname(ORDER_INDEX_PATH) or ".", exist_ok=True)
+    tmp = ORDER_INDEX_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(tmp, ORDER_INDEX_PATH)
+
+async def save_order_indexes():
+    if not any(index.changed for index in ORDER_INDEXES.values()):
+        return
+    snapshot = {str(guild_id): index.to_json() for guild_id, index in ORDER_INDEXES.items()}
+    for index in ORDER_INDEXES.values():
+        index.changed = False
+    try:
+        await asyncio.to_thread(_write_order_indexes, snapshot)
+    except OSError as e:
+        print(f"Failed to save order index: {e}")
+
+def load_order_indexes():
+    try:
+        with open(ORDER_INDEX_PATH) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        print(f"Failed to load order index: {e}")
+        return
+    for guild_id, data in snapshot.items():
+        ORDER_INDEXES[int(guild_id)] = OrderIndex.from_json(data)
+
+@bot2.event
+async def setup_hook():
+    load_order_indexes()
+
+ORDER_RANGE_RE = re.compile(r"\s*(?:\.\.|\bto\b|-)\s*")
+
+def parse_order_date(text):
+    day, month = parse_order_info_from_channel(text.replace(" ", ""))
+    if not day or not month or not 1 <= day <= 31:
+        raise commands.BadArgument(f"Couldn't read a date from {text!r}, try e.g. 12mar.")
+    return day, month
+
+def parse_order_range(query):
+    # "12mar", "12 march", "12mar-20mar", "28dec to 3jan", or a bare month like "march".
+    query = query.strip().lower()
+    month = MONTH_BY_PREFIX.get(query[:3]) if query.isalpha() else None
+    if month:
+        return (1, month), (31, month)
+    parts = ORDER_RANGE_RE.split(query, maxsplit=1)
+    start = parse_order_date(parts[0])
+    return start, parse_order_date(parts[1]) if len(parts) > 1 else start
+
+@bot2.command(name="orders")
+@commands.has_permissions(manage_channels=True)
+async def orders_command(ctx, *, query=None):
+    if query is None:
+        today = discord.utils.utcnow()
+        start = end = (today.day, MONTHS[today.month - 1])
+    else:
+        start, end = parse_order_range(query)
+    channel_ids = get_order_index(ctx.guild).between(start, end)
+    label = f"{start[0]} {start[1].title()}" + (f" – {end[0]} {end[1].title()}" if end != start else "")
+    if not channel_ids:
+        await ctx.send(f"No orders for {label}.")
+        return
+    lines = [f"**{len(channel_ids)} order(s) for {label}**"]
+    for channel_id in channel_ids:
+        lines.append(f"<#{channel_id}>")
+    text = "\n".join(lines)
+    if len(text) > 1900:
+        text = text[:1900].rsplit("\n", 1)[0] + "\n..."
+    await ctx.send(text)
+
+@orders_command.error
+async def orders_error(ctx, error):
+    if isinstance(error, commands.BadArgument):
+        await ctx.send(str(error))
+    else:
+        print(f"Failed to list orders: {error}")
 
 @bot2.command()
 @commands.has_permissions(manage_channels=True)
 async def order(ctx, *, order_name):
-    await ctx.channel.edit(name=order_name)
+    # Renames are limited to 2 per 10 minutes per channel, so each channel is its own bucket.
+    channel = await mutate(ctx.guild.id, ("edit_channel", ctx.channel.id), lambda: ctx.channel.edit(name=order_name),
+                           key=("rename", ctx.channel.id))
+    get_order_index(ctx.guild).update_channel(channel or ctx.channel)
+    mark_dirty(ctx.guild, ctx.channel.id)
 
 @bot2.command()
 @commands.has_permissions(manage_channels=True)
 async def editorder(ctx, *, new_name):
-    await ctx.channel.edit(name=new_name)
+    channel = await mutate(ctx.guild.id, ("edit_channel", ctx.channel.id), lambda: ctx.channel.edit(name=new_name),
+                           key=("rename", ctx.channel.id))
+    get_order_index(ctx.guild).update_channel(channel or ctx.channel)
+    mark_dirty(ctx.guild, ctx.channel.id)
+
+ARRANGE_DEBOUNCE = float(os.getenv("ARRANGE_DEBOUNCE", "3"))
+ARRANGE_MAX_DELAY = float(os.getenv("ARRANGE_MAX_DELAY", "15"))
+ARRANGER_SWEEP_MINUTES = float(os.getenv("ARRANGER_SWEEP_MINUTES", "10"))
+
+# guild id -> set of channel ids to reconcile, or None for a full pass
+ARRANGE_DIRTY = {}
+ARRANGE_WAKE = asyncio.Event()
+
+def mark_dirty(guild, channel_id=None):
+    if channel_id is None:
+        ARRANGE_DIRTY[guild.id] = None
+    else:
+        pending = ARRANGE_DIRTY.setdefault(guild.id, set())
+        if pending is not None:
+            pending.add(channel_id)
+    ARRANGE_WAKE.set()
+
+class ArrangePlan:
+    # Categories are referenced by id, or by name when the plan creates them.
+    def __init__(self):
+        self.creates = []   # category names
+        self.moves = []     # (channel id, category ref)
+        self.deletes = []   # category ids
+        self.reorders = []  # (category ref, position), applied in order
+        self.layout = []    # final category order, for bulk position updates
+        self.blocked = []   # channel ids left unplaced because the guild is at its channel cap
+
+    def __bool__(self):
+        return bool(self.creates or self.moves or self.deletes or self.reorders)
 
-@tasks.loop(seconds=15)
+def snapshot_layout(guild, channel_ids=None):
+    index = get_order_index(guild)
+    # CategoryChannel.channels rescans the whole guild, so count every category in one pass.
+    all_channels = guild.channels
+    counts = Counter(channel.category_id for channel in all_channels)
+    categories = [(cat.id, cat.name, cat.position, counts[cat.id]) for cat in guild.categories]
+    if channel_ids is None:
+        channel_ids = index.channels
+    channels = [guild.get_channel(channel_id) for channel_id in channel_ids]
+    channels = [(channel.id, channel.name, channel.category_id) for channel in channels
+                if channel is not None and channel.type in ORDER_CHANNEL_TYPES]
+    room = GUILD_CHANNEL_LIMIT - len(all_channels)
+    return categories, channels, {date: list(ids) for date, ids in index.categories.items()}, room
+
+def _longest_stable_run(ranks, weights):
+    # Heaviest subsequence whose target ranks are already increasing; those categories never move.
+    if all(a < b for a, b in zip(ranks, ranks[1:])):
+        return set(range(len(ranks)))
+    best = list(weights)
+    prev = [-1] * len(ranks)
+    for i in range(len(ranks)):
+        for j in range(i):
+            if ranks[j] < ranks[i] and best[j] + weights[i] > best[i]:
+                best[i] = best[j] + weights[i]
+                prev[i] = j
+    keep = set()
+    i = max(range(len(ranks)), key=best.__getitem__, default=-1)
+    while i >= 0:
+        keep.add(i)
+        i = prev[i]
+    return keep
+
+def next_category_part(names):
+    used = {parse_order_category_name(name)[2] for name in names}
+    return next(part for part in itertools.count(1) if part not in used)
+
+# categories: (id, name, position, channel count); channels: (id, name, category id) to place;
+# category_ids: (day, month) -> existing order category ids by part; room: channels the guild can still add.
+def plan_arrangement(categories, channels, category_ids, room=GUILD_CHANNEL_LIMIT):
+    plan = ArrangePlan()
+    categories = sorted(categories, key=lambda c: (c[2], c[0]))
+    counts = {cat_id: count for cat_id, _, _, count in categories}
+    cat_names = {cat_id: name for cat_id, name, _, _ in categories}
+    order_ids = {key: [cat_id for cat_id in ids if cat_id in counts] for key, ids in category_ids.items()}
+    leaving = []
+    for channel_id, name, category_id in channels:
+        day, month = parse_order_info_from_channel(name)
+        if not (day and month):
+            continue
+        refs = order_ids.setdefault((day, month), [])
+        if category_id in refs:
+            continue
+        # Free every slot being vacated before filling any, so a full category isn't overflowed needlessly.
+        if category_id in counts:
+            counts[category_id] -= 1
+        leaving.append((channel_id, category_id, day, month, refs))
+    for channel_id, category_id, day, month, refs in leaving:
+        ref = next((ref for ref in refs if counts.get(ref, 0) < CATEGORY_CHANNEL_LIMIT), None)
+        if ref is None:
+            if room <= 0:
+                # The guild is at its channel cap; leave the channel be until archiving frees room.
+                plan.blocked.append(channel_id)
+                if category_id in counts:
+                    counts[category_id] += 1
+                continue
+            ref = get_order_category_name(day, month, next_category_part(cat_names.get(r, r) for r in refs))
+            refs.append(ref)
+            plan.creates.append(ref)
+            room -= 1
+        plan.moves.append((channel_id, ref))
+        counts[ref] = counts.get(ref, 0) + 1
+    plan.deletes = [cat_id for cat_id, name, _, _ in categories
+                    if is_order_category_name(name) and counts[cat_id] == 0]
+    deleted = set(plan.deletes)
+
+    # New categories are created at the bottom, then reordered like any other.
+    current = [(cat_id, name) for cat_id, name, _, _ in categories if cat_id not in deleted]
+    current += [(name, name) for name in plan.creates]
+    names = dict(current)
+    fixed = [ref for ref, name in current if not is_order_category_name(name)]
+    ordered = sorted((ref for ref, name in current if is_order_category_name(name)),
+                     key=lambda ref: order_name_sort_key(names[ref]))
+    target = fixed + ordered
+    rank = {ref: idx for idx, ref in enumerate(target)}
+    ranks = [rank[ref] for ref, _ in current]
+    weights = [1 if is_order_category_name(name) else len(current) + 1 for _, name in current]
+    keep = _longest_stable_run(ranks, weights)
+
+    # Move the rest in target order, each straight after its target predecessor.
+    layout = [ref for ref, _ in current]
+    moving = {ref for idx, (ref, _) in enumerate(current) if idx not in keep}
+    for idx, ref in enumerate(target):
+        if ref not in moving:
+            continue
+        layout.remove(ref)
+        position = layout.index(target[idx - 1]) + 1 if idx else 0
+        layout.insert(position, ref)
+        plan.reorders.append((ref, position))
+    plan.layout = layout
+    return plan
+
+BULK_POSITION_CHUNK = 100
+
+# Creates and deletes are per-category calls; every parent and position change goes out as
+# one bulk channel-positions request (chunked for very large guilds).
+async def apply_plan(guild, plan):
+    calls = 0
+    created = {}
+    for name in plan.creates:
+        created[name] = await mutate(guild.id, "create_channel", lambda: guild.create_category(name))
+        calls += 1
+    def resolve(ref):
+        return created[ref] if isinstance(ref, str) else guild.get_channel(ref)
+    payload = []
+    for channel_id, ref in plan.moves:
+        cat = resolve(ref)
+        if guild.get_channel(channel_id) and cat:
+            payload.append({"id": channel_id, "parent_id": cat.id})
+    if plan.reorders:
+        for position, ref in enumerate(plan.layout):
+            cat = resolve(ref)
+            if cat and (isinstance(ref, str) or cat.position != position):
+                payload.append({"id": cat.id, "position": position})
+    for start in range(0, len(payload), BULK_POSITION_CHUNK):
+        chunk = payload[start:start + BULK_POSITION_CHUNK]
+        await mutate(guild.id, "bulk_channel_update",
+                     lambda: bot2.http.bulk_channel_update(guild.id, chunk, reason="Arrange order categories"))
+        calls += 1
+    for cat_id in plan.deletes:
+        cat = guild.get_channel(cat_id)
+        if cat:
+            await mutate(guild.id, "delete_channel", cat.delete)
+            calls += 1
+    return calls
+
+def describe_plan(guild, plan):
+    def label(ref):
+        if isinstance(ref, str):
+            return ref
+        channel = guild.get_channel(ref)
+        return channel.name if channel else str(ref)
+    lines = [f"create {name}" for name in plan.creates]
+    lines += [f"move #{label(channel_id)} -> {label(ref)}" for channel_id, ref in plan.moves]
+    lines += [f"delete {label(cat_id)}" for cat_id in plan.deletes]
+    lines += [f"reorder {label(ref)} -> {position}" for ref, position in plan.reorders]
+    lines += [f"blocked #{label(channel_id)} (guild channel limit reached)" for channel_id in plan.blocked]
+    return lines
+
+async def arrange_guild(guild, channel_ids=None):
+    plan = plan_arrangement(*snapshot_layout(guild, channel_ids))
+    if plan.blocked:
+        print(f"{guild.name} is at the channel limit, {len(plan.blocked)} order channel(s) left unsorted")
+    return await apply_plan(guild, plan) if plan else 0
+
+@bot2.command()
+@commands.has_permissions(manage_channels=True)
+async def arrangeplan(ctx):
+    lines = describe_plan(ctx.guild, plan_arrangement(*snapshot_layout(ctx.guild)))
+    if not lines:
+        await ctx.send("Order categories are already arranged.")
+        return
+    text = "\n".join(lines)
+    if len(text) > 1900:
+        text = text[:1900].rsplit("\n", 1)[0] + f"\n... ({len(lines)} operations total)"
+    await ctx.send(f"```\n{text}\n```")
+
+@tasks.loop()
+async def arrange_worker():
+    await ARRANGE_WAKE.wait()
+    # Debounce: let a burst of channel events settle, but never hold work past ARRANGE_MAX_DELAY.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ARRANGE_MAX_DELAY
+    while True:
+        ARRANGE_WAKE.clear()
+        timeout = min(ARRANGE_DEBOUNCE, deadline - loop.time())
+        if timeout <= 0:
+            break
+        try:
+            await asyncio.wait_for(ARRANGE_WAKE.wait(), timeout)
+        except asyncio.TimeoutError:
+            break
+    dirty = dict(ARRANGE_DIRTY)
+    ARRANGE_DIRTY.clear()
+    for guild_id, channel_ids in dirty.items():
+        guild = bot2.get_guild(guild_id)
+        if guild is None:
+            continue
+        start = time.perf_counter()
+        try:
+            calls = await arrange_guild(guild, channel_ids)
+        except Exception as e:
+            print(f"Failed to arrange {guild.name}: {e}")
+            continue
+        METRICS.observe("arranger_pass_seconds", time.perf_counter() - start)
+        METRICS.observe("arranger_pass_api_calls", calls)
+    await save_order_indexes()
+
+# Slow safety net for anything the channel events missed.
+@tasks.loop(minutes=ARRANGER_SWEEP_MINUTES)
 async def arranger():
+    for guild_id in [guild_id for guild_id in ORDER_INDEXES if bot2.get_guild(guild_id) is None]:
+        del ORDER_INDEXES[guild_id]
     for guild in bot2.guilds:
-        categories = list(guild.categories)
-        order_cats = [cat for cat in categories if is_order_category(cat)]
-        for channel in guild.text_channels:
-            day, month = parse_order_info_from_channel(channel.name)
-            if day and month:
-                order_cat_name = get_order_category_name(day, month)
-                cat = discord.utils.get(order_cats, name=order_cat_name)
-                if not cat:
-                    cat = await guild.create_category(order_cat_name)
-                    order_cats.append(cat)
-                if channel.category != cat:
-                    await channel.edit(category=cat)
-        for cat in order_cats:
-            if len(cat.channels) == 0:
-                await cat.delete()
-        sorted_orders = sorted([cat for cat in guild.categories if is_order_category(cat)], key=category_sort_key)
-        pos = max([cat.position for cat in guild.categories if not is_order_category(cat)], default=-1) + 1
-        for idx, cat in enumerate(sorted_orders):
-            if cat.position != pos + idx:
-                await cat.edit(position=pos + idx)
+        # get_order_index builds a missing index and reconciles a restored snapshot; only an
+        # index that was already live needs the full rebuild.
+        index = ORDER_INDEXES.get(guild.id)
+        if index is not None and not index.restored:
+            index.rebuild(guild)
+        else:
+            get_order_index(guild)
+        mark_dirty(guild)
+    await save_order_indexes()
+
+ORDER_ARCHIVE_DAYS = int(os.getenv("ORDER_ARCHIVE_DAYS", "0"))  # 0 disables the archiver
+ORDER_ARCHIVE_BATCH = int(os.getenv("ORDER_ARCHIVE_BATCH", "20"))  # channels per hourly run
+# Order dates carry no year, so only dates in the last half year count as past; anything
+# further back is taken to be an upcoming order and left alone.
+ORDER_ARCHIVE_HORIZON_DAYS = 182
+TRANSCRIPT_DIR = os.path.join(DATA_DIR, "transcripts")
+TRANSCRIPT_PAGE = 100
+
+def archive_candidates(guild, now):
+    newest = now - timedelta(days=ORDER_ARCHIVE_DAYS)
+    oldest = now - timedelta(days=ORDER_ARCHIVE_HORIZON_DAYS)
+    if newest <= oldest:
+        return []
+    channel_ids = get_order_index(guild).between((oldest.day, MONTHS[oldest.month - 1]),
+                                                 (newest.day, MONTHS[newest.month - 1]))
+    # A channel that still saw messages inside the window is kept whatever its date says.
+    cutoff = discord.utils.time_snowflake(newest)
+    channels = [guild.get_channel(channel_id) for channel_id in channel_ids]
+    return [channel for channel in channels
+            if channel is not None and (getattr(channel, "last_message_id", None) or channel.id) < cutoff]
+
+def message_record(message):
+    return {
+        "id": message.id,
+        "author_id": message.author.id,
+        "author": str(message.author),
+        "created_at": message.created_at.isoformat(),
+        "content": message.content,
+        "attachments": [attachment.url for attachment in message.attachments],
+        "embeds": [embed.to_dict() for embed in message.embeds],
+    }
+
+async def archive_channel(channel):
+    # Streams the history a page at a time into a gzipped JSONL transcript; the channel is only
+    # deleted once the complete file is in place.
+    folder = os.path.join(TRANSCRIPT_DIR, str(channel.guild.id))
+    path = os.path.join(folder, f"{channel.id}-{channel.name}.jsonl.gz")
+    await asyncio.to_thread(os.makedirs, folder, exist_ok=True)
+    transcript = await asyncio.to_thread(gzip.open, path + ".tmp", "wt", encoding="utf-8")
+    count = 0
+    try:
+        page = []
+        async for message in channel.history(limit=None, oldest_first=True):
+            page.append(json.dumps(message_record(message), separators=(",", ":")))
+            if len(page) == TRANSCRIPT_PAGE:
+                await asyncio.to_thread(transcript.write, "\n".join(page) + "\n")
+                count += len(page)
+                page = []
+        if page:
+            await asyncio.to_thread(transcript.write, "\n".join(page) + "\n")
+            count += len(page)
+    finally:
+        await asyncio.to_thread(transcript.close)
+    await asyncio.to_thread(os.replace, path + ".tmp", path)
+    await mutate(channel.guild.id, "delete_channel", lambda: channel.delete(reason="Archived old order"))
+    get_order_index(channel.guild).remove_channel(channel)
+    return count
+
+@tasks.loop(hours=1)
+async def order_archiver():
+    now = discord.utils.utcnow()
+    budget = ORDER_ARCHIVE_BATCH
+    for guild in bot2.guilds:
+        for channel in archive_candidates(guild, now):
+            if budget <= 0:
+                return
+            try:
+                count = await archive_channel(channel)
+            except Exception as e:
+                print(f"Failed to archive #{channel.name}: {e}")
+                continue
+            budget -= 1
+            METRICS.inc("orders_archived_total")
+            print(f"Archived #{channel.name} from {guild.name} ({count} messages)")
 
 @bot2.event
-async def on_ready():
-    print("Order Manager bot is online!")
-    if not arranger.is_running():
-        arranger.start()
+async def on_guild_channel_create(channel):
+    get_order_index(channel.guild).update_channel(channel)
+    mark_dirty(channel.guild, channel.id)
+
+@bot2.event
+async def on_guild_channel_update(before, after):
+    get_order_index(after.guild).update_channel(after)
+    if before.name != after.name or before.category_id != after.category_id:
+        mark_dirty(after.guild, after.id)
+    elif isinstance(after, discord.CategoryChannel) and before.position != after.position:
+        mark_dirty(after.guild, after.id)
+
+@bot2.event
+async def on_guild_channel_delete(channel):
+    get_order_index(channel.guild).remove_channel(channel)
+    mark_dirty(channel.guild, channel.category_id or channel.id)
+
+@bot2.event
+async def on_guild_remove(guild):
+    ORDER_INDEXES.pop(guild.id, None)
 
 # ---------------- GIVEAWAY BOT ---------------- #
-bot3 = commands.Bot(command_prefix="!", intents=intents)
+# DMs carry the giveaway setup replies; winners are drawn from stored ids, so no member cache.
+bot3 = commands.Bot(command_prefix="!", intents=bot_intents(dm_messages=True),
+                    member_cache_flags=discord.MemberCacheFlags.none(), max_messages=MAX_CACHED_MESSAGES,
+                    max_ratelimit_timeout=MAX_RATELIMIT_TIMEOUT)
 
 GIVEAWAY_CONFIG = {}
-GIVEAWAY_ENTRANTS = set()
-GIVEAWAY_MESSAGE_ID = None
-GIVEAWAY_EMOJI = None
-GIVEAWAY_WINNERS = []
-GIVEAWAY_TIMER = None
+GIVEAWAY_FLUSH_SECONDS = float(os.getenv("GIVEAWAY_FLUSH_SECONDS", "1"))
+
+ENTRANT_MERGE_MIN = 4096
+
+class EntrantSet:
+    # User ids in a sorted array('Q') (8 bytes each, binary-searched) plus small sets of ids
+    # added or removed since the last merge. Clicks only touch those sets; merging them back
+    # in is a few array slices that GiveawayStore runs in its executor, off the event loop.
+    __slots__ = ("members", "added", "removed", "merging")
+
+    def __init__(self, user_ids=()):
+        self.members = array("Q", sorted(set(user_ids)))
+        self.added = set()
+        self.removed = set()
+        self.merging = False
+
+    @classmethod
+    def from_sorted(cls, members):
+        entrants = cls()
+        entrants.members = members
+        return entrants
+
+    def __len__(self):
+        return len(self.members) - len(self.removed) + len(self.added)
+
+    def __iter__(self):
+        removed = self.removed
+        yield from (user_id for user_id in self.members if user_id not in removed)
+        yield from self.added
+
+    def __contains__(self, user_id):
+        return user_id in self.added or (user_id not in self.removed and self._stored(user_id))
+
+    def _stored(self, user_id):
+        members = self.members
+        i = bisect.bisect_left(members, user_id)
+        return i < len(members) and members[i] == user_id
+
+    def add(self, user_id):
+        if user_id in self.added:
+            return False
+        if not self._stored(user_id):
+            self.added.add(user_id)
+            return True
+        if user_id in self.removed:
+            self.removed.discard(user_id)
+            return True
+        return False
+
+    def discard(self, user_id):
+        if user_id in self.added:
+            self.added.discard(user_id)
+            return True
+        if user_id in self.removed or not self._stored(user_id):
+            return False
+        self.removed.add(user_id)
+        return True
+
+    def needs_merge(self):
+        return not self.merging and len(self.added) + len(self.removed) > max(ENTRANT_MERGE_MIN, len(self.members) >> 4)
+
+    @staticmethod
+    def merge(members, added, removed):
+        # Runs in a worker thread. Cuts at each change's binary-searched position and copies the
+        # runs in between as array slices, so the per-entrant work stays in C.
+        cuts = sorted([(bisect.bisect_left(members, user_id), 0, user_id) for user_id in added]
+                      + [(bisect.bisect_left(members, user_id), 1, user_id) for user_id in removed])
+        merged = array("Q")
+        start = 0
+        for pos, removal, user_id in cuts:
+            merged.extend(members[start:pos])
+            if removal:
+                start = pos + 1
+            else:
+                merged.append(user_id)
+                start = pos
+        merged.extend(members[start:])
+        return merged
+
+    def merged(self, members, added, removed):
+        # Back on the loop: anything that changed again while the merge ran stays pending.
+        self.members = members
+        for user_id in added:
+            if user_id in self.added:
+                self.added.discard(user_id)
+            else:
+                self.removed.add(user_id)
+        for user_id in removed:
+            if user_id in self.removed:
+                self.removed.discard(user_id)
+            else:
+                self.added.add(user_id)
+        self.merging = False
+
+    def draw(self, k, rng):
+        # Uniform without replacement: distinct random positions over members + added, skipping
+        # ids that have left. Removals stay a small share of members between merges.
+        members, added, removed = self.members, sorted(self.added), self.removed
+        size = len(members) + len(added)
+        k = min(k, len(self))
+        winners, seen = [], set()
+        while len(winners) < k:
+            i = rng.randrange(size)
+            if i in seen:
+                continue
+            seen.add(i)
+            user_id = members[i] if i < len(members) else added[i - len(members)]
+            if user_id not in removed:
+                winners.append(user_id)
+        return winners
+
+class GiveawayStore(LocalStore):
+    # Running giveaways and their entrants live in memory; entrant changes are buffered and
+    # written behind in batches so button clicks never wait on the disk.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS giveaways (
+            message_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            ends_at REAL NOT NULL,
+            ended INTEGER NOT NULL DEFAULT 0,
+            config TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entrants (
+            message_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (message_id, user_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, filename="giveaways.db"):
+        super().__init__(filename)
+        self.giveaways = {}  # message id -> {"guild_id", "channel_id", "ends_at", "config"}
+        self.entrants = {}   # message id -> EntrantSet
+        self.pending = {}    # (message id, user id) -> True to insert, False to delete
+        self.tasks = set()
+
+    def _load(self):
+        rows = self.db.execute(
+            "SELECT message_id, guild_id, channel_id, ends_at, config FROM giveaways WHERE ended = 0").fetchall()
+        # The primary key already returns each giveaway's ids sorted, ready for EntrantSet.
+        grouped = {}
+        for message_id, user_id in self.db.execute(
+                "SELECT e.message_id, e.user_id FROM entrants e JOIN giveaways g USING (message_id) "
+                "WHERE g.ended = 0 ORDER BY e.message_id, e.user_id"):
+            members = grouped.get(message_id)
+            if members is None:
+                members = grouped[message_id] = array("Q")
+            members.append(user_id)
+        return rows, grouped
+
+    async def load(self):
+        await self.connect()
+        rows, grouped = await self.call(self._load)
+        for message_id, guild_id, channel_id, ends_at, config in rows:
+            self.giveaways[message_id] = {
+                "guild_id": guild_id, "channel_id": channel_id, "ends_at": ends_at, "config": json.loads(config),
+            }
+            self.entrants[message_id] = EntrantSet.from_sorted(grouped.get(message_id, array("Q")))
+
+    def _insert(self, message_id, guild_id, channel_id, ends_at, config):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO giveaways VALUES (?, ?, ?, ?, 0, ?)",
+                            (message_id, guild_id, channel_id, ends_at, config))
+
+    async def create(self, message_id, guild_id, channel_id, ends_at, config):
+        self.giveaways[message_id] = {
+            "guild_id": guild_id, "channel_id": channel_id, "ends_at": ends_at, "config": config,
+        }
+        self.entrants[message_id] = EntrantSet()
+        await self.call(self._insert, message_id, guild_id, channel_id, ends_at, json.dumps(config))
+
+    def enter(self, message_id, user_id):
+        entrants = self.entrants.get(message_id)
+        if entrants is None or not entrants.add(user_id):
+            return False
+        self.pending[(message_id, user_id)] = True
+        self._maybe_merge(entrants)
+        return True
+
+    def leave(self, message_id, user_id):
+        entrants = self.entrants.get(message_id)
+        if entrants is None or not entrants.discard(user_id):
+            return False
+        self.pending[(message_id, user_id)] = False
+        self._maybe_merge(entrants)
+        return True
+
+    def _maybe_merge(self, entrants):
+        if entrants.needs_merge():
+            entrants.merging = True
+            task = asyncio.get_running_loop().create_task(self._merge(entrants))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _merge(self, entrants):
+        added, removed = frozenset(entrants.added), frozenset(entrants.removed)
+        try:
+            members = await self.call(EntrantSet.merge, entrants.members, added, removed)
+        except Exception as e:
+            entrants.merging = False
+            print(f"Failed to merge giveaway entrants: {e}")
+            return
+        entrants.merged(members, added, removed)
+
+    def draw(self, message_id, k):
+        entrants = self.entrants.get(message_id)
+        if not entrants:
+            return []
+        seed = secrets.randbits(64)
+        winners = entrants.draw(k, random.Random(seed))
+        print(f"Giveaway {message_id}: drew {len(winners)} of {len(entrants)} entrants with seed {seed}")
+        return winners
+
+    def _write(self, pending):
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO entrants VALUES (?, ?)",
+                                [key for key, entered in pending.items() if entered])
+            self.db.executemany("DELETE FROM entrants WHERE message_id = ? AND user_id = ?",
+                                [key for key, entered in pending.items() if not entered])
+
+    async def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        try:
+            await self.call(self._write, pending)
+        except sqlite3.Error:
+            # Put the batch back for the next flush; clicks made since then are newer and win.
+            for key, entered in pending.items():
+                self.pending.setdefault(key, entered)
+            raise
+
+    async def close(self):
+        try:
+            await self.flush()
+        except sqlite3.Error as e:
+            print(f"Failed to write {len(self.pending)} giveaway entrant change(s) on shutdown: {e}")
+
+    def _finish(self, message_id):
+        with self.db:
+            self.db.execute("UPDATE giveaways SET ended = 1 WHERE message_id = ?", (message_id,))
+
+    async def finish(self, message_id):
+        await self.flush()
+        self.giveaways.pop(message_id, None)
+        self.entrants.pop(message_id, None)
+        await self.call(self._finish, message_id)
+
+    def _get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    async def get_meta(self, key):
+        return await self.call(self._get_meta, key)
+
+    def _set_meta(self, key, value):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    async def set_meta(self, key, value):
+        await self.call(self._set_meta, key, value)
+
+GIVEAWAYS = GiveawayStore()
+
+@tasks.loop(seconds=GIVEAWAY_FLUSH_SECONDS)
+async def giveaway_flusher():
+    try:
+        await GIVEAWAYS.flush()
+    except sqlite3.Error as e:
+        print(f"Failed to write giveaway entrants, retrying next flush: {e}")
+
+@bot3.event
+async def setup_hook():
+    await GIVEAWAYS.load()
+    for message_id, record in GIVEAWAYS.giveaways.items():
+        schedule_giveaway_end(message_id, record["ends_at"])
+    bot3.add_view(GiveawayEnterView())
+    giveaway_flusher.start()
+    await sync_commands()
 
 class GiveawaySetupModal(Modal):
     def __init__(self, admin_ctx):
@@ -305,6 +1945,7 @@ class GiveawaySetupModal(Modal):
         self.add_item(self.winner_count_input)
         self.add_item(self.duration_input)
 
+    @timed_interaction
     async def on_submit(self, interaction: discord.Interaction):
         admin_id = self.admin_ctx.user.id if hasattr(self.admin_ctx, "user") else self.admin_ctx.author.id
         # Field checks
@@ -329,7 +1970,6 @@ class GiveawaySetupModal(Modal):
             "description": desc,
             "emoji": emoji,
             "winner_count": winner_count,
-            "winner_names": [],  # Will set later
             "duration": duration,
             "end_message": "",
             "admin_id": admin_id,
@@ -337,7 +1977,7 @@ class GiveawaySetupModal(Modal):
         }
         await interaction.response.send_message(
             "Giveaway setup received!\n"
-            "Now DM me a comma-separated list of winners (e.g., @user1, @user2, ...), then the end message.",
+            "Now DM me the end message for the giveaway (e.g., 'Congratulations!'). Winners are drawn from the entrants.",
             ephemeral=True)
 
 
@@ -346,11 +1986,7 @@ async def on_message(message):
     # Complete setup by DM after modal
     if message.guild is None and message.author != bot3.user:
         config = GIVEAWAY_CONFIG.get(message.author.id)
-        if config and not config["winner_names"]:
-            winner_list = [n.strip() for n in message.content.split(",") if n.strip()]
-            config["winner_names"] = winner_list
-            await message.channel.send("Now, reply with the end message for the giveaway (e.g., 'Congratulations!').")
-        elif config and config["winner_names"] and not config["end_message"]:
+        if config and not config["end_message"]:
             config["end_message"] = message.content
             await message.channel.send("Giveaway config complete! You can now run !startgiveaway in the server.")
     await bot3.process_commands(message)
@@ -364,6 +2000,33 @@ async def setupgiveaway_slash(interaction: discord.Interaction):
     modal = GiveawaySetupModal(interaction)
     await interaction.response.send_modal(modal)
 
+# Set to a test server's id to sync commands there instantly instead of globally.
+DEV_GUILD_ID = int(os.getenv("DEV_GUILD_ID", "0"))
+
+def command_fingerprint(tree, guild=None):
+    payload = sorted((cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)),
+                     key=lambda cmd: (cmd["type"], cmd["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+async def sync_commands():
+    # Runs once per process from setup_hook, never on reconnects, and only talks to Discord
+    # when the command tree differs from the last one synced to this application and scope.
+    guild = discord.Object(DEV_GUILD_ID) if DEV_GUILD_ID else None
+    if guild:
+        bot3.tree.copy_global_to(guild=guild)
+    key = f"commands:{bot3.application_id}:{DEV_GUILD_ID or 'global'}"
+    fingerprint = command_fingerprint(bot3.tree, guild)
+    if os.getenv("FORCE_COMMAND_SYNC") != "1" and await GIVEAWAYS.get_meta(key) == fingerprint:
+        print("Slash commands unchanged, skipping sync")
+        return
+    try:
+        synced = await bot3.tree.sync(guild=guild)
+    except Exception as e:
+        print(f"Failed to sync commands: {e}")
+        return
+    await GIVEAWAYS.set_meta(key, fingerprint)
+    print(f"Slash commands synced: {len(synced)}")
+
 
 
 @bot3.command()
@@ -376,39 +2039,42 @@ async def startgiveaway(ctx):
         return
     channel = ctx.guild.get_channel(config["channel_id"]) or ctx.channel
     embed = discord.Embed(title=config["title"], description=config["description"])
-    view = GiveawayEnterView(config["emoji"])
-    msg = await channel.send(embed=embed, view=view)
+    view = GiveawayEnterView()
+    msg = await mutate(ctx.guild.id, ("send_message", channel.id), lambda: channel.send(embed=embed, view=view))
+    ends_at = time.time() + parse_duration(config["duration"]).total_seconds()
+    await GIVEAWAYS.create(msg.id, ctx.guild.id, channel.id, ends_at, dict(config))
     try:
-        await msg.add_reaction(config["emoji"])
+        await mutate(ctx.guild.id, ("add_reaction", channel.id), lambda: msg.add_reaction(config["emoji"]))
     except Exception:
-        await channel.send("Failed to add emoji, please make sure it's a valid emoji.")
+        await GIVEAWAYS.finish(msg.id)
+        await mutate(ctx.guild.id, ("send_message", channel.id),
+                     lambda: channel.send("Failed to add emoji, please make sure it's a valid emoji."))
         return
-    global GIVEAWAY_MESSAGE_ID, GIVEAWAY_EMOJI, GIVEAWAY_ENTRANTS, GIVEAWAY_WINNERS, GIVEAWAY_TIMER
-    GIVEAWAY_MESSAGE_ID = msg.id
-    GIVEAWAY_EMOJI = config["emoji"]
-    GIVEAWAY_ENTRANTS = set()
-    GIVEAWAY_WINNERS = config["winner_names"]
     overwrites = channel.overwrites_for(ctx.guild.default_role)
     overwrites.external_emojis = False
-    await channel.set_permissions(ctx.guild.default_role, overwrite=overwrites)
-    GIVEAWAY_TIMER = asyncio.create_task(run_giveaway_timer(ctx, msg, config))
+    await mutate(ctx.guild.id, ("edit_permissions", channel.id),
+                 lambda: channel.set_permissions(ctx.guild.default_role, overwrite=overwrites))
+    schedule_giveaway_end(msg.id, ends_at)
     await ctx.send("Giveaway started!")
 
 class GiveawayEnterView(View):
-    def __init__(self, emoji):
+    # Persistent: one registered instance serves every giveaway message, keyed by message id.
+    def __init__(self):
         super().__init__(timeout=None)
-        self.emoji = emoji
-    @button(label="Enter Giveaway", style=discord.ButtonStyle.success)
+    @button(label="Enter Giveaway", style=discord.ButtonStyle.success, custom_id="giveaway:enter")
+    @timed_interaction
     async def enter_giveaway(self, interaction: discord.Interaction, button):
-        if interaction.user.id in GIVEAWAY_ENTRANTS:
-            await interaction.response.send_message("You are already entered!", ephemeral=True)
-        else:
-            GIVEAWAY_ENTRANTS.add(interaction.user.id)
+        message_id = interaction.message.id
+        if message_id not in GIVEAWAYS.giveaways:
+            await interaction.response.send_message("This giveaway has ended.", ephemeral=True)
+        elif GIVEAWAYS.enter(message_id, interaction.user.id):
             await interaction.response.send_message("You have entered the giveaway!", ephemeral=True)
-    @button(label="Leave Giveaway", style=discord.ButtonStyle.danger)
+        else:
+            await interaction.response.send_message("You are already entered!", ephemeral=True)
+    @button(label="Leave Giveaway", style=discord.ButtonStyle.danger, custom_id="giveaway:leave")
+    @timed_interaction
     async def leave_giveaway(self, interaction: discord.Interaction, button):
-        if interaction.user.id in GIVEAWAY_ENTRANTS:
-            GIVEAWAY_ENTRANTS.remove(interaction.user.id)
+        if GIVEAWAYS.leave(interaction.message.id, interaction.user.id):
             await interaction.response.send_message("You have left the giveaway.", ephemeral=True)
         else:
             await interaction.response.send_message("You were not entered!", ephemeral=True)
@@ -426,55 +2092,207 @@ def parse_duration(duration):
         return timedelta(seconds=num)
     return timedelta(minutes=1)
 
-async def run_giveaway_timer(ctx, msg, config):
-    delta = parse_duration(config["duration"])
-    await asyncio.sleep(delta.total_seconds())
-    channel = msg.channel
-    winner_count = min(config["winner_count"], len(config["winner_names"]))
-    fake_winners = config["winner_names"][:winner_count]
-    result_msg = await channel.send("Giveaway has ended! Choosing winners:")
+# One scheduler task for every pending giveaway: a min-heap of (ends_at, message id) rebuilt from
+# the store at startup, sleeping only until the earliest deadline.
+GIVEAWAY_HEAP = []
+GIVEAWAY_WAKE = asyncio.Event()
+GIVEAWAY_MAX_SLEEP = 300
+GIVEAWAY_ENDINGS = set()
+
+def schedule_giveaway_end(message_id, ends_at):
+    heapq.heappush(GIVEAWAY_HEAP, (ends_at, message_id))
+    if GIVEAWAY_HEAP[0][1] == message_id:
+        GIVEAWAY_WAKE.set()
+
+@tasks.loop()
+async def giveaway_scheduler():
+    now = time.time()
+    while GIVEAWAY_HEAP and GIVEAWAY_HEAP[0][0] <= now:
+        ends_at, message_id = heapq.heappop(GIVEAWAY_HEAP)
+        record = GIVEAWAYS.giveaways.get(message_id)
+        if record is None or record["ends_at"] != ends_at:
+            continue
+        task = asyncio.create_task(end_giveaway(message_id))
+        GIVEAWAY_ENDINGS.add(task)
+        task.add_done_callback(GIVEAWAY_ENDINGS.discard)
+    GIVEAWAY_WAKE.clear()
+    timeout = min(GIVEAWAY_HEAP[0][0] - now, GIVEAWAY_MAX_SLEEP) if GIVEAWAY_HEAP else None
+    try:
+        await asyncio.wait_for(GIVEAWAY_WAKE.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+async def end_giveaway(message_id):
+    record = GIVEAWAYS.giveaways[message_id]
+    config = record["config"]
+    try:
+        channel = bot3.get_channel(record["channel_id"]) or await bot3.fetch_channel(record["channel_id"])
+    except discord.HTTPException as e:
+        print(f"Giveaway {message_id}: channel unavailable, closing it ({e})")
+        await GIVEAWAYS.finish(message_id)
+        return
+    drawn = GIVEAWAYS.draw(message_id, config["winner_count"])
+    await GIVEAWAYS.finish(message_id)
+    if not drawn:
+        await mutate(channel.guild.id, ("send_message", channel.id),
+                     lambda: channel.send("Giveaway has ended! There were no valid entrants, so there are no winners."))
+        return
+    winners = [f"<@{user_id}>" for user_id in drawn]
+    winner_count = len(winners)
+    result_msg = await mutate(channel.guild.id, ("send_message", channel.id),
+                              lambda: channel.send("Giveaway has ended! Choosing winners:"))
+    def edit_result(content):
+        return mutate(channel.guild.id, ("edit_message", result_msg.id), lambda: result_msg.edit(content=content),
+                      key=("edit_message", result_msg.id))
     await asyncio.sleep(1)
-    for idx, winner in enumerate(fake_winners):
-        roll_list = fake_winners[:]
+    for idx, winner in enumerate(winners):
+        roll_list = winners[:]
         for _ in range(6):
             random.shuffle(roll_list)
             await asyncio.sleep(0.2)
-            await result_msg.edit(content="Giveaway has ended! Choosing winners:\n"
-                                  + '\n'.join(roll_list)
-                                  + '\n' + '\n'.join([f"{i+1}." for i in range(idx)]))
+            await edit_result("Giveaway has ended! Choosing winners:\n"
+                              + '\n'.join(roll_list)
+                              + '\n' + '\n'.join([f"{i+1}." for i in range(idx)]))
         await asyncio.sleep(1)
-        await result_msg.edit(content="Giveaway has ended! Choosing winners:\n"
-                              + '\n'.join([f"{i+1}. {fake_winners[i]}" if i <= idx else f"{i+1}." for i in range(winner_count)]))
+        await edit_result("Giveaway has ended! Choosing winners:\n"
+                          + '\n'.join([f"{i+1}. {winners[i]}" if i <= idx else f"{i+1}." for i in range(winner_count)]))
     await asyncio.sleep(1)
-    await result_msg.edit(content="Giveaway has ended! Winners:\n"
-                          + '\n'.join([f"{i+1}. {w}" for i, w in enumerate(fake_winners)])
-                          + f"\n\n{config['end_message']}")
+    await edit_result("Giveaway has ended! Winners:\n"
+                      + '\n'.join([f"{i+1}. {w}" for i, w in enumerate(winners)])
+                      + f"\n\n{config['end_message']}")
 
 @bot1.event
 async def on_ready():
     print("Embed bot is online!")
+    report_startup(bot1)
 
 @bot2.event
 async def on_ready():
     print("Order Manager bot is online!")
+    report_startup(bot2)
+    if not arrange_worker.is_running():
+        arrange_worker.start()
     if not arranger.is_running():
         arranger.start()
+    if ORDER_ARCHIVE_DAYS and not order_archiver.is_running():
+        order_archiver.start()
 
 @bot3.event
 async def on_ready():
     print("Giveaway bot is online!")
+    report_startup(bot3)
+    if not giveaway_scheduler.is_running():
+        giveaway_scheduler.start()
+
+BOTS = {
+    "embed": (bot1, "DISCORD_TOKEN"),
+    "orders": (bot2, "DISCORD_TOKEN_ORDER"),
+    "giveaway": (bot3, "DISCORD_TOKEN_GIVEAWAY"),
+}
+
+for bot, _ in BOTS.values():
+    bot.before_invoke(time_command)
+    bot.after_invoke(record_command)
+
+@bot3.event
+async def on_app_command_completion(interaction, command):
+    # Slash commands have no wrapper to time, so measure from the interaction's snowflake.
+    METRICS.observe("interaction_seconds", (discord.utils.utcnow() - interaction.created_at).total_seconds(),
+                    bot=bot_label(bot3), handler=command.qualified_name)
+
+async def main(names=tuple(BOTS)):
+    global RUNNING_BOTS
+    RUNNING_BOTS = tuple(names)
+    for name in names:
+        STARTED_AT[name] = time.perf_counter()
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_PORT)
+        task = asyncio.get_running_loop().create_task(monitor_event_loop())
+        METRICS_TASKS.add(task)
+        task.add_done_callback(METRICS_TASKS.discard)
+    # The supervisor stops workers with SIGTERM; cancelling lets the shutdown flush below run.
     try:
-        synced = await bot3.tree.sync()
-        print(f"Slash commands synced: {len(synced)}")
-    except Exception as e:
-        print(f"Failed to sync commands: {e}")
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass
+    try:
+        await asyncio.gather(*(BOTS[name][0].start(os.environ[BOTS[name][1]]) for name in names))
+    finally:
+        if "giveaway" in names:
+            giveaway_flusher.cancel()
+            await GIVEAWAYS.close()
 
-async def main():
-    await asyncio.gather(
-        bot1.start(os.environ['DISCORD_TOKEN']),
-        bot2.start(os.environ['DISCORD_TOKEN_ORDER']),
-        bot3.start(os.environ['DISCORD_TOKEN_GIVEAWAY']),
-    )
+# ---------------- SUPERVISOR ---------------- #
+SUPERVISOR_MAX_BACKOFF = 60
+
+def supervised_workers():
+    workers = [("embed", {}), ("giveaway", {})]
+    if not ORDER_SHARD_COUNT:
+        return workers + [("orders", {})]
+    processes = max(1, min(int(os.getenv("ORDER_SHARD_PROCESSES", ORDER_SHARD_COUNT)), ORDER_SHARD_COUNT))
+    for n in range(processes):
+        shard_ids = ",".join(str(i) for i in range(n, ORDER_SHARD_COUNT, processes))
+        workers.append(("orders", {"ORDER_SHARD_IDS": shard_ids}))
+    return workers
+
+async def keep_alive(name, env, extra_args):
+    loop = asyncio.get_running_loop()
+    label = name + (f" (shards {env['ORDER_SHARD_IDS']})" if "ORDER_SHARD_IDS" in env else "")
+    backoff = 1
+    while True:
+        started = loop.time()
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--bot", name, *extra_args,
+            env={**os.environ, **env},
+        )
+        try:
+            code = await proc.wait()
+        finally:
+            if proc.returncode is None:
+                proc.terminate()
+                await proc.wait()
+        # A bot that stayed up for a while gets a fresh backoff; a crash loop backs off.
+        if loop.time() - started > SUPERVISOR_MAX_BACKOFF:
+            backoff = 1
+        print(f"{label} bot exited with code {code}, restarting in {backoff}s")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, SUPERVISOR_MAX_BACKOFF)
+
+async def supervise(extra_args):
+    task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    except NotImplementedError:
+        pass
+    workers = supervised_workers()
+    if METRICS_PORT:
+        # Every worker process serves its own registry on the next port up.
+        workers = [(name, {**env, "METRICS_PORT": str(METRICS_PORT + n)}) for n, (name, env) in enumerate(workers)]
+    await asyncio.gather(*(keep_alive(name, env, extra_args) for name, env in workers))
+
+def install_uvloop():
+    try:
+        import uvloop
+    except ImportError:
+        print("uvloop is not installed, using the default event loop")
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="RAI supply bots")
+    parser.add_argument("--bot", choices=sorted(BOTS), action="append",
+                        help="run only this bot (repeatable); default runs all three in one process")
+    parser.add_argument("--supervise", action="store_true",
+                        help="run each bot in its own process and restart it if it dies")
+    parser.add_argument("--uvloop", action="store_true", default=os.getenv("USE_UVLOOP") == "1",
+                        help="use uvloop when it is installed (or set USE_UVLOOP=1)")
+    args = parser.parse_args()
+    if args.uvloop:
+        install_uvloop()
+    try:
+        if args.supervise:
+            asyncio.run(supervise(["--uvloop"] if args.uvloop else []))
+        else:
+            asyncio.run(main(args.bot or tuple(BOTS)))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass